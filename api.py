@@ -0,0 +1,123 @@
+import hmac
+import json
+from datetime import date
+from flask import Blueprint, Response, current_app, jsonify, request, stream_with_context
+from flask_login import current_user
+from models import db, Group, Student, Discipline, LaboratoryWork, WorkGroup, ResultLabWork, ControlWork, \
+    ResultControlWork
+from pagination import paginate
+
+api = Blueprint("api", __name__, url_prefix="/api")
+
+EXPORT_CHUNK = 1000
+
+# Данные, доступные через API: таблица и выдаваемые столбцы.
+# Столбцы id_* можно использовать как фильтры: /api/results_lw?id_student=5
+RESOURCES = {
+    "groups": (Group, (Group.id, Group.number)),
+    "students": (Student, (Student.id, Student.fullName, Student.dateBirth, Student.id_group)),
+    "disciplines": (Discipline, (Discipline.id, Discipline.name)),
+    "lab_works": (LaboratoryWork, (LaboratoryWork.id, LaboratoryWork.number, LaboratoryWork.name,
+                                   LaboratoryWork.id_discipline)),
+    "control_works": (ControlWork, (ControlWork.id, ControlWork.number, ControlWork.name, ControlWork.deadline,
+                                    ControlWork.id_discipline)),
+    "work_groups": (WorkGroup, (WorkGroup.id, WorkGroup.deadline, WorkGroup.id_LaboratoryWork,
+                                WorkGroup.id_discipline, WorkGroup.id_group)),
+    "results_lw": (ResultLabWork, (ResultLabWork.id, ResultLabWork.status, ResultLabWork.grade,
+                                   ResultLabWork.id_LaboratoryWork, ResultLabWork.id_discipline,
+                                   ResultLabWork.id_student)),
+    "results_cw": (ResultControlWork, (ResultControlWork.id, ResultControlWork.status, ResultControlWork.grade,
+                                       ResultControlWork.id_controlWork, ResultControlWork.id_discipline,
+                                       ResultControlWork.id_student)),
+}
+
+
+def error(status, message):
+    response = jsonify(error=message)
+    response.status_code = status
+    return response
+
+
+# Доступ: администратор, вошедший в систему, или внешняя программа с токеном API_TOKEN в заголовке Authorization
+@api.before_request
+def check_access():
+    token = current_app.config.get("API_TOKEN")
+    if token and hmac.compare_digest(request.headers.get("Authorization", ""), "Bearer " + token):
+        return None
+    if current_user.is_authenticated and current_user.role == "администратор":
+        return None
+    return error(401, "unauthorized")
+
+
+def to_json_value(value):
+    if isinstance(value, date):
+        return value.isoformat()
+    return value
+
+
+def serialize(columns, row):
+    return {column.key: to_json_value(value) for column, value in zip(columns, row)}
+
+
+def resource_query(name):
+    model, columns = RESOURCES[name]
+    query = db.session.query(*columns)
+    for column in columns:
+        if column.key.startswith("id_") and column.key in request.args:
+            try:
+                query = query.filter(column == int(request.args[column.key]))
+            except ValueError:
+                return None, None, columns
+    return model, query, columns
+
+
+# Ответ с ETag: при совпадении с If-None-Match клиент получает 304 без тела
+def conditional(data):
+    response = jsonify(data)
+    response.add_etag()
+    response.headers["Cache-Control"] = "private, no-cache"
+    return response.make_conditional(request)
+
+
+@api.route("/<string:name>")
+def resource_list(name):
+    if name not in RESOURCES:
+        return error(404, "unknown resource")
+    model, query, columns = resource_query(name)
+    if query is None:
+        return error(400, "filter values must be integers")
+    page = paginate(query, {"id": model.id}, "id", model.id)
+    return conditional(dict(
+        items=[serialize(columns, row) for row in page],
+        next=page.next_url,
+        prev=page.prev_url,
+    ))
+
+
+@api.route("/<string:name>/<int:id>")
+def resource_item(name, id):
+    if name not in RESOURCES:
+        return error(404, "unknown resource")
+    model, columns = RESOURCES[name]
+    row = db.session.query(*columns).filter(model.id == id).first()
+    if row is None:
+        return error(404, "not found")
+    return conditional(serialize(columns, row))
+
+
+# Выгрузка всей таблицы в формате NDJSON (одна строка JSON на запись). Строки читаются из курсора на стороне сервера
+# пачками по EXPORT_CHUNK и сразу отправляются клиенту, поэтому память не растёт с размером таблицы
+@api.route("/<string:name>/export")
+def resource_export(name):
+    if name not in RESOURCES:
+        return error(404, "unknown resource")
+    model, query, columns = resource_query(name)
+    if query is None:
+        return error(400, "filter values must be integers")
+    query = query.order_by(model.id).yield_per(EXPORT_CHUNK)
+
+    def generate():
+        for row in query:
+            yield json.dumps(serialize(columns, row), ensure_ascii=False) + "\n"
+
+    return Response(stream_with_context(generate()), mimetype="application/x-ndjson")
@@ -0,0 +1,167 @@
+import io
+import os
+import sys
+from asgiref.wsgi import WsgiToAsgi
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import Session
+from werkzeug.exceptions import HTTPException
+from app import create_app
+from database import POOL_OPTIONS, PRIMARY
+from models import db
+
+# Асинхронный режим: uvicorn asgi:application
+# Запросы GET и HEAD выполняются в самом цикле событий: обработчики Flask работают как обычно, но сессия db.session
+# подключена к асинхронному драйверу (asyncpg, aiosqlite), и на время ожидания ответа БД поток переходит к другим
+# запросам. Остальные запросы и потоковые ответы обрабатываются в пуле потоков, как под WSGI-сервером
+
+ASYNC_DRIVERS = {"postgresql": "postgresql+asyncpg", "sqlite": "sqlite+aiosqlite"}
+THREADED_ENDPOINTS = {"static", "api.resource_export"}
+
+
+# Строка подключения для асинхронного драйвера: DB_ASYNC_URI или DB_REPLICA_URI/DB_URI с заменённым драйвером.
+# Запросы GET только читают данные, поэтому при наличии реплики они идут на неё
+def async_url(app, uri=None):
+    url = make_url(uri or app.config.get("DB_ASYNC_URI") or app.config.get("DB_REPLICA_URI")
+                   or app.config["SQLALCHEMY_DATABASE_URI"])
+    if url.drivername not in ASYNC_DRIVERS.values():
+        url = url.set(drivername=ASYNC_DRIVERS[url.get_backend_name()])
+    if url.get_backend_name() == "sqlite" and url.database and not os.path.isabs(url.database):
+        url = url.set(database=os.path.join(app.root_path, url.database))
+    return url
+
+
+def engine_options(app, url):
+    options = {"pool_pre_ping": bool(app.config.get("DB_POOL_PRE_PING", True))}
+    if url.get_backend_name() != "sqlite":
+        for key, option in POOL_OPTIONS:
+            if app.config.get(key) is not None:
+                options[option] = app.config[key]
+    timeout = app.config.get("DB_STATEMENT_TIMEOUT")
+    if timeout and url.drivername == "postgresql+asyncpg":
+        options["connect_args"] = {"server_settings": {"statement_timeout": str(timeout)}}
+    return options
+
+
+# Синхронная сторона асинхронной сессии: внутри db.primary() (загрузка данных для кешей) команды выполняются на
+# основной БД, если запросы GET идут на реплику
+class ReadSession(Session):
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        engine = self.info.get("primary_engine")
+        if engine is not None and self.info.get(PRIMARY):
+            return engine
+        return super().get_bind(mapper, clause, **kwargs)
+
+
+# Окружение WSGI для запроса без тела
+def build_environ(scope):
+    server = scope.get("server") or ("localhost", 80)
+    environ = {
+        "REQUEST_METHOD": scope["method"],
+        "SCRIPT_NAME": scope.get("root_path", "").encode("utf-8").decode("latin-1"),
+        "PATH_INFO": scope["path"].encode("utf-8").decode("latin-1"),
+        "QUERY_STRING": scope.get("query_string", b"").decode("ascii"),
+        "SERVER_NAME": server[0],
+        "SERVER_PORT": str(server[1]),
+        "SERVER_PROTOCOL": "HTTP/%s" % scope.get("http_version", "1.1"),
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": scope.get("scheme", "http"),
+        "wsgi.input": io.BytesIO(),
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": True,
+        "wsgi.run_once": False,
+    }
+    if scope.get("client"):
+        environ["REMOTE_ADDR"] = scope["client"][0]
+    for name, value in scope.get("headers", []):
+        name = name.decode("latin-1")
+        if name == "content-type":
+            key = "CONTENT_TYPE"
+        elif name == "content-length":
+            key = "CONTENT_LENGTH"
+        else:
+            key = "HTTP_" + name.upper().replace("-", "_")
+        value = value.decode("latin-1")
+        environ[key] = environ[key] + "," + value if key in environ else value
+    return environ
+
+
+class AsyncServer:
+    def __init__(self, app):
+        self.app = app
+        self.threaded = WsgiToAsgi(app)
+        self.engine = None
+        self.primary_engine = None
+
+    def get_engine(self):
+        if self.engine is None:
+            url = async_url(self.app)
+            self.engine = create_async_engine(url, **engine_options(self.app, url))
+            primary = async_url(self.app, self.app.config["SQLALCHEMY_DATABASE_URI"])
+            if primary != url:
+                self.primary_engine = create_async_engine(primary, **engine_options(self.app, primary))
+        return self.engine
+
+    def endpoint(self, path):
+        try:
+            return self.app.url_map.bind("").match(path, "GET")[0]
+        except HTTPException:
+            return None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self.lifespan(receive, send)
+        elif scope["type"] == "http" and scope["method"] in ("GET", "HEAD") \
+                and self.endpoint(scope["path"]) not in THREADED_ENDPOINTS:
+            await self.serve(scope, send)
+        else:
+            await self.threaded(scope, receive, send)
+
+    async def serve(self, scope, send):
+        engine = self.get_engine()
+        async with AsyncSession(engine, expire_on_commit=False, sync_session_class=ReadSession) as session:
+            if self.primary_engine is not None:
+                session.sync_session.info["primary_engine"] = self.primary_engine.sync_engine
+            status, headers, body = await session.run_sync(self.call_wsgi, build_environ(scope))
+        await send({
+            "type": "http.response.start",
+            "status": int(status.split(" ", 1)[0]),
+            "headers": [(name.lower().encode("latin-1"), value.encode("latin-1")) for name, value in headers],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+    # Вызов приложения Flask внутри run_sync: db.session этого запроса — синхронная сторона асинхронной сессии
+    def call_wsgi(self, session, environ):
+        response = {}
+
+        def start_response(status, headers, exc_info=None):
+            response["status"] = status
+            response["headers"] = headers
+
+        db.session.registry.set(session)
+        try:
+            result = self.app(environ, start_response)
+            try:
+                body = b"".join(result)
+            finally:
+                if hasattr(result, "close"):
+                    result.close()
+        finally:
+            db.session.registry.clear()
+        return response["status"], response["headers"], body
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                for engine in (self.engine, self.primary_engine):
+                    if engine is not None:
+                        await engine.dispose()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+
+application = AsyncServer(create_app())
@@ -0,0 +1,179 @@
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+from sqlalchemy import event
+from models import db, GradeAudit
+
+logger = logging.getLogger(__name__)
+
+
+# Записи журнала для оценок за одну работу: новые оценки и изменившиеся статус или оценка.
+# previous — прежние оценки (id ученика -> строка со status и grade), их возвращает summary.record_results
+def grade_changes(kind, id_work, id_discipline, rows, previous, id_user):
+    now = datetime.now()
+    events = []
+    for row in rows:
+        old = previous.get(row["id_student"])
+        old_status = old.status if old is not None else None
+        old_grade = old.grade if old is not None else None
+        if old is not None and old_status == row["status"] and old_grade == row["grade"]:
+            continue
+        events.append(dict(dateCreated=now, id_user=id_user, workType=kind, id_work=id_work,
+                           id_discipline=id_discipline, id_student=row["id_student"], oldStatus=old_status,
+                           oldGrade=old_grade, newStatus=row["status"], newGrade=row["grade"]))
+    return events
+
+
+# Журнал изменений оценок. Записи, переданные в record, попадают в БД только если транзакция запроса зафиксирована:
+# после фиксации они помещаются в ограниченную очередь, и фоновый поток записывает их пачками, не задерживая запрос.
+# При AUDIT_SYNC=1 (или если очередь переполнена) записи добавляются синхронно: в той же транзакции, что и оценки,
+# или отдельной транзакцией сразу после неё
+class AuditLog:
+    def __init__(self, app=None):
+        self.app = None
+        self.sync = False
+        self.queue_size = 10000
+        self.batch_size = 500
+        self.interval = 1.0
+        self.attempts = 3
+        self.queue = None
+        self.thread = None
+        self.pid = None
+        self.exit_handler = False
+        self.lock = threading.Lock()
+        self.written = 0
+        self.overflow = 0
+        self.lost = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.sync = bool(app.config.get("AUDIT_SYNC", self.sync))
+        self.queue_size = int(app.config.get("AUDIT_QUEUE_SIZE", self.queue_size))
+        self.batch_size = int(app.config.get("AUDIT_BATCH_SIZE", self.batch_size))
+        self.interval = float(app.config.get("AUDIT_FLUSH_INTERVAL", self.interval))
+        if not event.contains(db.session, "after_commit", self.after_commit):
+            event.listen(db.session, "after_commit", self.after_commit)
+            event.listen(db.session, "after_soft_rollback", self.after_rollback)
+        app.extensions["audit_log"] = self
+
+    # Вызывается в транзакции, изменяющей оценки, до её фиксации
+    def record(self, events):
+        if not events:
+            return
+        if self.sync:
+            db.session.execute(GradeAudit.__table__.insert(), events)
+        else:
+            session = db.session()
+            if not session.in_transaction():
+                # Без открытой транзакции rollback() не вызывает событий, и записи остались бы до следующей фиксации
+                session.begin()
+            session.info.setdefault("audit", []).extend(events)
+
+    def after_commit(self, session):
+        events = session.info.pop("audit", None)
+        if events:
+            self.enqueue(events)
+
+    # Вызывается при любом rollback(), в том числе если транзакция в БД ещё не начиналась
+    def after_rollback(self, session, previous_transaction):
+        session.info.pop("audit", None)
+
+    # Поток записи запускается при первой записи, то есть уже в рабочем процессе сервера
+    def start(self):
+        with self.lock:
+            if self.thread is None or self.pid != os.getpid():
+                self.queue = queue.Queue(maxsize=self.queue_size)
+                self.pid = os.getpid()
+                self.thread = threading.Thread(target=self.run, name="audit-writer", daemon=True)
+                self.thread.start()
+                if not self.exit_handler:
+                    atexit.register(self.close)
+                    self.exit_handler = True
+        return self.queue
+
+    def enqueue(self, events):
+        events_queue = self.start()
+        for index, item in enumerate(events):
+            try:
+                events_queue.put_nowait(item)
+            except queue.Full:
+                with self.lock:
+                    self.overflow += len(events) - index
+                self.write(events[index:])
+                return
+
+    def run(self):
+        events_queue = self.queue
+        while True:
+            batch = [events_queue.get()]
+            deadline = time.monotonic() + self.interval
+            while len(batch) < self.batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(events_queue.get(timeout=timeout))
+                except queue.Empty:
+                    break
+            stop = None in batch
+            self.write([item for item in batch if item is not None])
+            for _ in batch:
+                events_queue.task_done()
+            if stop:
+                return
+
+    # Запись пачки отдельным соединением; при ошибке запись повторяется, затем пачка считается потерянной
+    def write(self, events):
+        if not events:
+            return
+        for attempt in range(1, self.attempts + 1):
+            try:
+                with self.app.app_context():
+                    with db.engine.begin() as connection:
+                        connection.execute(GradeAudit.__table__.insert(), events)
+                with self.lock:
+                    self.written += len(events)
+                return
+            except Exception:
+                if attempt == self.attempts:
+                    with self.lock:
+                        self.lost += len(events)
+                    logger.exception("Записи журнала оценок не сохранены: %d", len(events))
+                    return
+                time.sleep(0.1 * attempt)
+
+    # Запись оставшихся в очереди записей при завершении процесса
+    def close(self):
+        with self.lock:
+            thread, events_queue = self.thread, self.queue
+            self.thread = None
+        if thread is None or self.pid != os.getpid():
+            return
+        try:
+            events_queue.put(None, timeout=10)
+        except queue.Full:
+            return
+        thread.join(timeout=10)
+
+    # Ожидание записи всего, что уже помещено в очередь
+    def flush(self):
+        if self.queue is not None and self.pid == os.getpid():
+            self.queue.join()
+
+    def stats(self):
+        with self.lock:
+            return dict(
+                size=self.queue.qsize() if self.queue is not None else 0,
+                written=self.written,
+                overflow=self.overflow,
+                lost=self.lost,
+            )
+
+
+audit_log = AuditLog()
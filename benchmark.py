@@ -0,0 +1,180 @@
+import json
+import math
+import os
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from sqlalchemy import event
+from models import db, User, Student, Teacher, TeacherGroup, Group, WorkGroup, ControlWork, TeacherDiscipline
+
+# Замеры основных страниц через тестовый клиент Flask на данных seed.py:
+# задержка (перцентили), число SQL-команд на запрос и пиковая память Python на запрос
+
+
+def percentile(values, p):
+    values = sorted(values)
+    if not values:
+        return None
+    return values[max(0, math.ceil(p / 100 * len(values)) - 1)]
+
+
+# Адреса страниц для пользователей, созданных seed.py с тем же префиксом
+def targets(prefix):
+    student = db.session.query(Student).join(User, Student.id_user == User.id) \
+        .filter(User.login == prefix + "_s1").first()
+    teacher = db.session.query(Teacher).join(User, Teacher.id_user == User.id) \
+        .filter(User.login == prefix + "_t1").first()
+    if student is None or teacher is None:
+        raise ValueError("Нет данных с префиксом %s: сначала выполните flask seed-data" % prefix)
+    group = db.session.query(Group).join(TeacherGroup, TeacherGroup.id_group == Group.id) \
+        .filter(TeacherGroup.id_teacher == teacher.id).order_by(Group.id).first()
+    lab = db.session.query(WorkGroup) \
+        .join(TeacherDiscipline, TeacherDiscipline.id_discipline == WorkGroup.id_discipline) \
+        .filter(TeacherDiscipline.id_teacher == teacher.id, WorkGroup.id_group == group.id) \
+        .order_by(WorkGroup.id).first()
+    control = db.session.query(ControlWork) \
+        .join(TeacherDiscipline, TeacherDiscipline.id_discipline == ControlWork.id_discipline) \
+        .filter(TeacherDiscipline.id_teacher == teacher.id).order_by(ControlWork.id).first()
+    return [
+        ("login", None, "/login"),
+        ("profile_student", "s1", "/profile_student"),
+        ("profile_teacher", "t1", "/profile_teacher"),
+        ("group", "t1", "/group/%s/%d" % (group.number, group.id)),
+        ("result_lw", "t1", "/result_lw/%d/%d/%d" % (group.id, lab.id_LaboratoryWork, lab.id_discipline)),
+        ("result_cw", "t1", "/result_cw/%d/%d/%d" % (group.id, control.id, control.id_discipline)),
+    ]
+
+
+class StatementCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, *args):
+        self.count += 1
+
+
+def run(app, prefix="bench", password="password", iterations=50, warmup=5):
+    with app.app_context():
+        routes = targets(prefix)
+        engine = db.engine
+
+    def login(login_name):
+        client = app.test_client()
+        response = client.post("/login", data={"login": login_name, "password": password})
+        if response.status_code != 302:
+            raise RuntimeError("Не удалось войти как %s: код %d" % (login_name, response.status_code))
+        return client
+
+    clients = {"s1": login(prefix + "_s1"), "t1": login(prefix + "_t1")}
+
+    def request(user, url):
+        if user is None:
+            response = app.test_client().post(url, data={"login": prefix + "_s1", "password": password})
+            expected = 302
+        else:
+            response = clients[user].get(url)
+            expected = 200
+        if response.status_code != expected:
+            raise RuntimeError("%s: код ответа %d" % (url, response.status_code))
+
+    counter = StatementCounter()
+    results = {}
+    event.listen(engine, "after_cursor_execute", counter)
+    try:
+        for name, user, url in routes:
+            for _ in range(warmup):
+                request(user, url)
+            counter.count = 0
+            times = []
+            for _ in range(iterations):
+                start = time.perf_counter()
+                request(user, url)
+                times.append((time.perf_counter() - start) * 1000)
+            results[name] = dict(
+                url=url,
+                p50_ms=round(percentile(times, 50), 2),
+                p90_ms=round(percentile(times, 90), 2),
+                p99_ms=round(percentile(times, 99), 2),
+                max_ms=round(max(times), 2),
+                statements=round(counter.count / iterations, 1),
+            )
+    finally:
+        event.remove(engine, "after_cursor_execute", counter)
+
+    # Память замеряется отдельным проходом: tracemalloc замедляет выполнение и исказил бы время
+    tracemalloc.start()
+    try:
+        for name, user, url in routes:
+            tracemalloc.reset_peak()
+            base = tracemalloc.get_traced_memory()[0]
+            request(user, url)
+            results[name]["peak_kib"] = round((tracemalloc.get_traced_memory()[1] - base) / 1024, 1)
+    finally:
+        tracemalloc.stop()
+    return results
+
+
+# Запуск рабочего процесса в отдельном интерпретаторе: импорт модулей, create_app и два запроса страницы входа.
+# Время отсчитывается до импорта, чтобы учесть загрузку всех модулей приложения
+STARTUP_PROBE = '''
+import json, time
+start = time.perf_counter()
+from app import create_app
+imported = time.perf_counter()
+app = create_app()
+created = time.perf_counter()
+client = app.test_client()
+requests = []
+for _ in range(2):
+    begin = time.perf_counter()
+    status = client.get("/login").status_code
+    requests.append(time.perf_counter() - begin)
+    assert status == 200, status
+print(json.dumps(dict(import_ms=(imported - start) * 1000, create_ms=(created - imported) * 1000,
+                      first_request_ms=requests[0] * 1000, second_request_ms=requests[1] * 1000,
+                      ready_ms=(created - start + requests[0]) * 1000)))
+'''
+STARTUP_COLUMNS = ("import_ms", "create_ms", "first_request_ms", "second_request_ms", "ready_ms")
+
+
+# Время запуска рабочего процесса без предварительной компиляции шаблонов и с ней (медиана по runs запускам)
+def startup(root, runs=5):
+    results = {}
+    for name, precompile in (("lazy", "0"), ("precompiled", "1")):
+        samples = []
+        for _ in range(runs):
+            env = dict(os.environ, TEMPLATE_PRECOMPILE=precompile)
+            output = subprocess.run([sys.executable, "-c", STARTUP_PROBE], cwd=root, env=env, check=True,
+                                    capture_output=True, text=True).stdout
+            samples.append(json.loads(output.strip().splitlines()[-1]))
+        results[name] = {column: round(statistics.median(sample[column] for sample in samples), 2)
+                         for column in STARTUP_COLUMNS}
+    return results
+
+
+# Таблица результатов; если передан прежний результат, рядом выводится изменение в процентах
+def report(results, baseline=None, columns=("p50_ms", "p90_ms", "p99_ms", "max_ms", "statements", "peak_kib"),
+           title="route"):
+    lines = ["%-16s" % title + "".join("%18s" % column for column in columns)]
+    for name, data in results.items():
+        line = "%-16s" % name
+        for column in columns:
+            cell = "%g" % data[column]
+            old = (baseline or {}).get(name, {}).get(column)
+            if old:
+                cell += " (%+.0f%%)" % ((data[column] - old) / old * 100)
+            line += "%18s" % cell
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def load(path):
+    with open(path, encoding="utf-8") as file:
+        return json.load(file)
+
+
+def save(path, results):
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump(results, file, ensure_ascii=False, indent=2)
@@ -0,0 +1,95 @@
+import threading
+from collections import OrderedDict
+from contextlib import nullcontext
+
+
+# Счётчики поколений таблиц в памяти процесса: подходит, когда приложение работает в одном процессе
+class LocalBackend:
+    def __init__(self):
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def get_many(self, names):
+        with self.lock:
+            return [self.values.get(name, 0) for name in names]
+
+    def incr(self, name):
+        with self.lock:
+            self.values[name] = self.values.get(name, 0) + 1
+            return self.values[name]
+
+
+# Общие для всех процессов счётчики в Redis (нужен пакет redis)
+class RedisBackend:
+    def __init__(self, url, prefix="schoolsystem:generation:"):
+        import redis
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def get_many(self, names):
+        return [int(value or 0) for value in self.client.mget([self.prefix + name for name in names])]
+
+    def incr(self, name):
+        return self.client.incr(self.prefix + name)
+
+
+def create_backend(url):
+    if url:
+        return RedisBackend(url)
+    return LocalBackend()
+
+
+# Кеш редко меняющихся списков. Каждое значение хранится вместе с поколениями таблиц, из которых оно получено;
+# запись в таблицу увеличивает её поколение (bump), и при следующем обращении значение загружается заново
+class ReferenceCache:
+    def __init__(self, app=None):
+        self.backend = LocalBackend()
+        self.maxsize = 1000
+        self.primary = nullcontext
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.backend = create_backend(app.config.get("CACHE_BACKEND_URL"))
+        self.maxsize = int(app.config.get("REFERENCE_CACHE_SIZE", self.maxsize))
+        # Значения загружаются с основной БД (Database.primary), а не с реплики; БД подключается раньше кеша
+        if "sqlalchemy" in app.extensions:
+            self.primary = app.extensions["sqlalchemy"].db.primary
+        app.extensions["reference_cache"] = self
+
+    # Текущие поколения таблиц: меняются при каждой записи в любую из них
+    def generation(self, tables):
+        return tuple(self.backend.get_many(tables))
+
+    def get(self, key, tables, loader):
+        generation = self.generation(tables)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[0] == generation:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+        with self.primary():
+            value = loader()
+        with self.lock:
+            self.entries[key] = (generation, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+        return value
+
+    def bump(self, *tables):
+        for table in tables:
+            self.backend.incr(table)
+
+    def stats(self):
+        with self.lock:
+            return dict(size=len(self.entries), maxsize=self.maxsize, hits=self.hits, misses=self.misses)
+
+
+reference_cache = ReferenceCache()
@@ -0,0 +1,128 @@
+import csv
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from models import db
+import migrate
+import roster
+import summary
+import seed
+import benchmark
+from notifications import notifier
+from reports import report_worker
+
+
+# Обновление схемы БД: flask upgrade-db
+@click.command("upgrade-db")
+@with_appcontext
+def upgrade_db():
+    done = migrate.upgrade()
+    for version, name in done:
+        print("Применена миграция %04d_%s" % (version, name))
+    if not done:
+        print("Схема БД актуальна")
+
+
+# Полный пересчёт итогов успеваемости: flask refresh-summaries (запускать раз в сутки, например из cron)
+@click.command("refresh-summaries")
+@with_appcontext
+def refresh_summaries():
+    students, groups = summary.rebuild()
+    db.session.commit()
+    print("Итоги пересчитаны: учеников по дисциплинам %d, классов по дисциплинам %d" % (students, groups))
+
+
+# Уведомления о сроках сдачи: flask notify (постоянно работающий обработчик) или flask notify --once
+@click.command("notify")
+@with_appcontext
+@click.option("--once", is_flag=True, help="Один проход: поиск работ с подходящим сроком и отправка уведомлений")
+def notify_command(once):
+    if once:
+        created, sent = notifier.run_once()
+        print("Уведомлений создано: %d, отправлено: %d" % (created, sent))
+    else:
+        notifier.run()
+
+
+# Построение отчётов из очереди: flask report-worker (постоянно работающий обработчик) или flask report-worker --once
+@click.command("report-worker")
+@with_appcontext
+@click.option("--once", is_flag=True, help="Выполнить задания, которые сейчас в очереди, и завершиться")
+def report_worker_command(once):
+    if once:
+        print("Отчётов построено: %d" % report_worker.run_once())
+    else:
+        report_worker.run()
+
+
+# Синтетические данные для замеров (в отдельной БД): flask seed-data --groups 40 --students 30
+@click.command("seed-data")
+@with_appcontext
+@click.option("--groups", default=10, help="Число классов")
+@click.option("--students", default=25, help="Учеников в классе")
+@click.option("--teachers", default=10, help="Число преподавателей")
+@click.option("--disciplines", default=8, help="Число дисциплин")
+@click.option("--lab-works", default=10, help="Проверочных работ на дисциплину")
+@click.option("--control-works", default=4, help="Контрольных работ на дисциплину")
+@click.option("--graded", default=0.8, help="Доля работ, за которые выставлена оценка")
+@click.option("--password", default="password", help="Пароль всех созданных пользователей")
+@click.option("--prefix", default="bench", help="Префикс логинов")
+@click.option("--random-seed", default=1, help="Начальное значение генератора случайных чисел")
+def seed_data(groups, students, teachers, disciplines, lab_works, control_works, graded, password, prefix,
+              random_seed):
+    counts = seed.seed(groups, students, teachers, disciplines, lab_works, control_works, graded, password, prefix,
+                       random_seed)
+    print(", ".join("%s: %d" % item for item in counts.items()))
+
+
+# Замеры основных страниц: flask benchmark --output after.json --baseline before.json
+@click.command("benchmark")
+@with_appcontext
+@click.option("--iterations", default=50, help="Запросов к каждой странице")
+@click.option("--warmup", default=5, help="Запросов для прогрева перед замером")
+@click.option("--prefix", default="bench", help="Префикс логинов, заданный в seed-data")
+@click.option("--password", default="password", help="Пароль, заданный в seed-data")
+@click.option("--output", type=click.Path(dir_okay=False), help="Сохранить результат в файл JSON")
+@click.option("--baseline", type=click.Path(exists=True, dir_okay=False), help="Сравнить с сохранённым результатом")
+def benchmark_command(iterations, warmup, prefix, password, output, baseline):
+    results = benchmark.run(current_app._get_current_object(), prefix, password, iterations, warmup)
+    print(benchmark.report(results, benchmark.load(baseline) if baseline else None))
+    if output:
+        benchmark.save(output, results)
+
+
+# Время запуска рабочего процесса (импорт, create_app, первый запрос): flask benchmark-startup --runs 10
+@click.command("benchmark-startup")
+@click.option("--runs", default=5, help="Запусков в каждом режиме")
+@click.option("--output", type=click.Path(dir_okay=False), help="Сохранить результат в файл JSON")
+@click.option("--baseline", type=click.Path(exists=True, dir_okay=False), help="Сравнить с сохранённым результатом")
+@with_appcontext
+def benchmark_startup_command(runs, output, baseline):
+    results = benchmark.startup(current_app.root_path, runs)
+    print(benchmark.report(results, benchmark.load(baseline) if baseline else None, benchmark.STARTUP_COLUMNS, "mode"))
+    if output:
+        benchmark.save(output, results)
+
+
+# Загрузка списка из файла: flask import-users students roster.csv --report errors.csv
+@click.command("import-users")
+@with_appcontext
+@click.argument("kind", type=click.Choice(sorted(roster.COLUMNS)))
+@click.argument("path", type=click.Path(exists=True, dir_okay=False))
+@click.option("--report", "report_path", type=click.Path(dir_okay=False), help="Файл для списка ошибочных строк")
+def import_users_command(kind, path, report_path):
+    with open(path, "rb") as file:
+        report = roster.import_users(kind, roster.read_rows(file, path, kind))
+    print("Добавлено записей: %d, строк с ошибками: %d" % (report.created, len(report.errors)))
+    if report_path:
+        with open(report_path, "w", encoding="utf-8", newline="") as file:
+            writer = csv.writer(file)
+            writer.writerow(("line", "login", "error"))
+            writer.writerows(report.errors)
+    else:
+        for line, login, message in report.errors:
+            print("Строка %d (%s): %s" % (line, login, message))
+
+
+COMMANDS = (upgrade_db, refresh_summaries, notify_command, report_worker_command, seed_data, benchmark_command,
+            benchmark_startup_command, import_users_command)
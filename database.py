@@ -0,0 +1,84 @@
+import time
+from contextlib import contextmanager
+from flask import current_app, request, session
+from flask_sqlalchemy import SQLAlchemy, SignallingSession, get_state
+from sqlalchemy import orm
+from sqlalchemy.sql import Select
+
+REPLICA = "replica"
+PRIMARY = "primary"
+
+# Настройки пула соединений: ключ конфигурации приложения и параметр create_engine
+POOL_OPTIONS = (
+    ("DB_POOL_SIZE", "pool_size"),
+    ("DB_MAX_OVERFLOW", "max_overflow"),
+    ("DB_POOL_TIMEOUT", "pool_timeout"),
+    ("DB_POOL_RECYCLE", "pool_recycle"),
+)
+
+
+# Сессия, которая отправляет запросы SELECT на реплику, если для текущего HTTP-запроса это разрешено
+# (session.info["replica"]) и не запрошено чтение с основной БД (Database.primary). Запись, сброс изменений и прочие
+# команды всегда выполняются на основной БД
+class RoutingSession(SignallingSession):
+    def get_bind(self, mapper=None, clause=None):
+        if self.info.get(REPLICA) and not self.info.get(PRIMARY) and not self._flushing \
+                and isinstance(clause, Select):
+            state = get_state(self.app)
+            return state.db.get_engine(self.app, bind=REPLICA)
+        return super().get_bind(mapper, clause)
+
+
+class Database(SQLAlchemy):
+    def create_session(self, options):
+        return orm.sessionmaker(class_=RoutingSession, db=self, **options)
+
+    # Чтение с основной БД внутри блока with db.primary(): так читаются данные, которые сохраняются в кешах.
+    # Прочитанное с отстающей реплики попало бы в кеш под новым поколением таблиц и осталось бы там до следующей записи
+    @contextmanager
+    def primary(self):
+        session = self.session()
+        depth = session.info.get(PRIMARY, 0)
+        session.info[PRIMARY] = depth + 1
+        try:
+            yield
+        finally:
+            session.info[PRIMARY] = depth
+
+    def init_app(self, app):
+        replica_uri = app.config.get("DB_REPLICA_URI")
+        if replica_uri:
+            binds = dict(app.config.get("SQLALCHEMY_BINDS") or {})
+            binds[REPLICA] = replica_uri
+            app.config["SQLALCHEMY_BINDS"] = binds
+            app.before_request(self.route_request)
+            app.after_request(self.remember_write)
+        super().init_app(app)
+
+    # Параметры пула и ограничение времени выполнения запроса. Для SQLite пул не настраивается:
+    # Flask-SQLAlchemy открывает отдельное соединение на каждую сессию
+    def apply_driver_hacks(self, app, sa_url, options):
+        if not sa_url.drivername.startswith("sqlite"):
+            for key, option in POOL_OPTIONS:
+                if app.config.get(key) is not None:
+                    options.setdefault(option, app.config[key])
+        options.setdefault("pool_pre_ping", bool(app.config.get("DB_POOL_PRE_PING", True)))
+        timeout = app.config.get("DB_STATEMENT_TIMEOUT")
+        if timeout and sa_url.drivername.startswith("postgresql"):
+            connect_args = dict(options.get("connect_args") or {})
+            connect_args["options"] = (connect_args.get("options", "") + " -c statement_timeout=%d" % timeout).strip()
+            options["connect_args"] = connect_args
+        return super().apply_driver_hacks(app, sa_url, options)
+
+    # Запросы GET и HEAD читают с реплики. После изменения данных пользователь ещё DB_REPLICA_STICKY секунд читает
+    # с основной БД, чтобы сразу увидеть свои изменения, даже если реплика отстаёт
+    def route_request(self):
+        if request.method in ("GET", "HEAD") and session.get("db_primary_until", 0) < time.time():
+            self.session.info[REPLICA] = True
+
+    def remember_write(self, response):
+        if request.method not in ("GET", "HEAD", "OPTIONS"):
+            sticky = float(current_app.config.get("DB_REPLICA_STICKY", 5))
+            if sticky > 0:
+                session["db_primary_until"] = time.time() + sticky
+        return response
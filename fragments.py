@@ -0,0 +1,152 @@
+import threading
+from collections import OrderedDict
+from jinja2 import nodes
+from jinja2.ext import Extension
+from markupsafe import Markup
+
+# Кешируемые фрагменты шаблонов и таблицы, из которых они строятся. Запись в любую из таблиц (ReferenceCache.bump)
+# меняет её поколение, и фрагмент отрисовывается заново
+FRAGMENTS = {
+    "teacher_lab_works": ("LaboratoryWork", "Discipline", "TeacherDiscipline"),
+    "teacher_lab_work_options": ("LaboratoryWork", "Discipline", "TeacherDiscipline"),
+    "teacher_control_works": ("ControlWork", "Discipline", "TeacherDiscipline"),
+    "group_lab_works": ("WorkGroup", "LaboratoryWork", "Discipline", "TeacherDiscipline"),
+    "group_control_works": ("ControlWork", "Discipline", "TeacherDiscipline"),
+    "teacher_groups": ("Group", "TeacherGroup"),
+    "teacher_disciplines": ("Discipline", "TeacherDiscipline"),
+}
+
+
+# Данные для кешируемого фрагмента: загружаются при первом обращении, поэтому, если фрагмент взят из кеша,
+# запроса к БД нет
+class Lazy:
+    def __init__(self, loader, *args):
+        self.loader = loader
+        self.args = args
+        self.loaded = False
+        self.value = None
+
+    def get(self):
+        if not self.loaded:
+            self.value = self.loader(*self.args)
+            self.loaded = True
+        return self.value
+
+    def __iter__(self):
+        return iter(self.get())
+
+    def __len__(self):
+        return len(self.get())
+
+    def __bool__(self):
+        return bool(self.get())
+
+
+class LocalStore:
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            value = self.entries.get(key)
+            if value is not None:
+                self.entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        if self.maxsize <= 0:
+            return
+        with self.lock:
+            self.entries[key] = value
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self.entries)
+
+
+# Общее для всех процессов хранилище в Redis (нужен пакет redis). Устаревшие фрагменты не читаются, потому что
+# поколения таблиц входят в ключ, и удаляются по истечении ttl
+class RedisStore:
+    def __init__(self, url, ttl, prefix="schoolsystem:fragment:"):
+        import redis
+        self.client = redis.Redis.from_url(url)
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def get(self, key):
+        value = self.client.get(self.prefix + key)
+        return value.decode("utf-8") if value is not None else None
+
+    def set(self, key, value):
+        self.client.set(self.prefix + key, value.encode("utf-8"), ex=self.ttl)
+
+    def __len__(self):
+        return 0
+
+
+class FragmentCache:
+    def __init__(self, app=None):
+        self.generations = None
+        self.store = LocalStore(2000)
+        self.hits = 0
+        self.misses = 0
+        if app is not None:
+            self.init_app(app)
+
+    # Поколения таблиц берутся из кеша справочников, поэтому его нужно подключить раньше
+    def init_app(self, app):
+        self.generations = app.extensions["reference_cache"]
+        url = app.config.get("FRAGMENT_CACHE_URL")
+        if url:
+            self.store = RedisStore(url, int(app.config.get("FRAGMENT_CACHE_TTL", 3600)))
+        else:
+            self.store = LocalStore(int(app.config.get("FRAGMENT_CACHE_SIZE", 2000)))
+        app.jinja_env.add_extension(CacheExtension)
+        app.jinja_env.fragment_cache = self
+        app.extensions["fragment_cache"] = self
+
+    def get(self, name, keys, render):
+        generation = self.generations.generation(FRAGMENTS[name])
+        key = ":".join([name] + [str(value) for value in keys] + [str(value) for value in generation])
+        value = self.store.get(key)
+        if value is not None:
+            self.hits += 1
+            return value
+        self.misses += 1
+        # Данные фрагмента читаются с основной БД, как и значения кеша справочников
+        with self.generations.primary():
+            value = str(render())
+        self.store.set(key, value)
+        return value
+
+    def stats(self):
+        return dict(size=len(self.store), hits=self.hits, misses=self.misses)
+
+
+# Тег {% cache "имя", ключ1, ключ2 %} ... {% endcache %}: содержимое отрисовывается один раз для каждого набора
+# ключей и поколений таблиц фрагмента (FRAGMENTS)
+class CacheExtension(Extension):
+    tags = {"cache"}
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        name = parser.parse_expression()
+        keys = []
+        while parser.stream.skip_if("comma"):
+            keys.append(parser.parse_expression())
+        body = parser.parse_statements(("name:endcache",), drop_needle=True)
+        call = self.call_method("render_fragment", [name, nodes.List(keys)])
+        return nodes.CallBlock(call, [], [], body).set_lineno(lineno)
+
+    def render_fragment(self, name, keys, caller):
+        cache = getattr(self.environment, "fragment_cache", None)
+        if cache is None:
+            return caller()
+        return Markup(cache.get(name, keys, caller))
+
+
+fragment_cache = FragmentCache()
@@ -0,0 +1,181 @@
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+from itertools import repeat
+from werkzeug.security import DEFAULT_PBKDF2_ITERATIONS, generate_password_hash, check_password_hash
+
+
+class HasherBusy(Exception):
+    pass
+
+
+def hash_password(password, method, salt_length):
+    return generate_password_hash(password, method=method, salt_length=salt_length)
+
+
+def verify_password(password_hash, password):
+    return check_password_hash(password_hash, password)
+
+
+# Параметры хеширования в полном виде "pbkdf2:<хеш>:<число итераций>": werkzeug допускает запись без числа итераций
+# ("pbkdf2:sha256") и подставляет своё значение по умолчанию
+def normalize_method(method):
+    if not method.startswith("pbkdf2:"):
+        return method
+    args = method[7:].split(":")
+    iterations = int(args[1]) if len(args) > 1 and args[1] else DEFAULT_PBKDF2_ITERATIONS
+    return "pbkdf2:%s:%d" % (args[0], iterations)
+
+
+# Число процессов хеширования по умолчанию: пул создаётся в каждом процессе веб-сервера, поэтому процессоры делятся
+# между WEB_CONCURRENCY процессами сервера (переменная gunicorn)
+def default_workers():
+    return max(1, (os.cpu_count() or 1) // max(1, int(os.getenv("WEB_CONCURRENCY", 1))))
+
+
+# Хеширование паролей в пуле процессов. Число одновременно принятых задач ограничено (процессы + очередь):
+# если свободного места нет дольше HASH_WAIT_TIMEOUT секунд или результат не получен за HASH_RESULT_TIMEOUT секунд,
+# запрос получает отказ HasherBusy
+class PasswordHasher:
+    def __init__(self, app=None):
+        self.method = "pbkdf2:sha256:260000"
+        self.salt_length = 16
+        self.workers = 0
+        self.queue_limit = 0
+        self.wait_timeout = 0
+        self.result_timeout = 0
+        self.pool = None
+        self.slots = None
+        self.lock = threading.Lock()
+        self.count = 0
+        self.total_time = 0.0
+        self.max_time = 0.0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.rejected = 0
+        self.restarts = 0
+        self.fallbacks = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.method = app.config.get("HASH_METHOD", self.method)
+        self.salt_length = int(app.config.get("HASH_SALT_LENGTH", self.salt_length))
+        self.workers = int(app.config.get("HASH_WORKERS", default_workers()))
+        self.queue_limit = int(app.config.get("HASH_QUEUE_LIMIT", 4 * self.workers))
+        self.wait_timeout = float(app.config.get("HASH_WAIT_TIMEOUT", 5))
+        self.result_timeout = float(app.config.get("HASH_RESULT_TIMEOUT", 30))
+        self.slots = threading.BoundedSemaphore(self.workers + self.queue_limit) if self.workers else None
+        app.extensions["password_hasher"] = self
+
+    # Пул создаётся при первом обращении, то есть уже в рабочем процессе сервера, а не в родительском
+    def executor(self):
+        with self.lock:
+            if self.pool is None:
+                self.pool = ProcessPoolExecutor(max_workers=self.workers)
+            return self.pool
+
+    # Пул, в котором погиб процесс (нехватка памяти, сбой), больше не принимает задач: он заменяется новым
+    def reset(self, pool):
+        with self.lock:
+            if self.pool is not pool:
+                return
+            self.pool = None
+            self.restarts += 1
+        pool.shutdown(wait=False)
+
+    # Задача в пуле; если пул сломан, он пересоздаётся и задача повторяется один раз, затем выполняется в потоке запроса
+    def call(self, fn, *args):
+        for attempt in range(2):
+            pool = self.executor()
+            try:
+                return pool.submit(fn, *args).result(timeout=self.result_timeout)
+            except BrokenProcessPool:
+                self.reset(pool)
+            except FutureTimeout:
+                raise HasherBusy()
+        with self.lock:
+            self.fallbacks += 1
+        return fn(*args)
+
+    def run(self, fn, *args):
+        if not self.workers:
+            return self.timed(1, fn, *args)
+        if not self.slots.acquire(timeout=self.wait_timeout):
+            with self.lock:
+                self.rejected += 1
+            raise HasherBusy()
+        with self.lock:
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        try:
+            return self.timed(1, self.call, fn, *args)
+        finally:
+            with self.lock:
+                self.in_flight -= 1
+            self.slots.release()
+
+    def timed(self, count, fn, *args):
+        start = time.perf_counter()
+        try:
+            return fn(*args)
+        finally:
+            elapsed = time.perf_counter() - start
+            with self.lock:
+                self.count += count
+                self.total_time += elapsed
+                self.max_time = max(self.max_time, elapsed / count)
+
+    def hash(self, password):
+        return self.run(hash_password, password, self.method, self.salt_length)
+
+    def verify(self, password_hash, password):
+        return self.run(verify_password, password_hash, password)
+
+    # Массовое хеширование (загрузка списков): задачи передаются в пул пачками, минуя очередь запросов
+    def hash_many(self, passwords):
+        if not passwords:
+            return []
+        if not self.workers:
+            return self.timed(len(passwords), lambda: [hash_password(p, self.method, self.salt_length)
+                                                       for p in passwords])
+        return self.timed(len(passwords), self.map, passwords)
+
+    def map(self, passwords):
+        for attempt in range(2):
+            pool = self.executor()
+            try:
+                return list(pool.map(hash_password, passwords, repeat(self.method), repeat(self.salt_length),
+                                     chunksize=16))
+            except BrokenProcessPool:
+                self.reset(pool)
+        with self.lock:
+            self.fallbacks += 1
+        return [hash_password(p, self.method, self.salt_length) for p in passwords]
+
+    # Начало хеша werkzeug ("pbkdf2:sha256:260000") хранит параметры; хеш с другими параметрами пересчитывается
+    def needs_rehash(self, password_hash):
+        try:
+            return normalize_method(password_hash.split("$", 1)[0]) != normalize_method(self.method)
+        except ValueError:
+            return True
+
+    def stats(self):
+        with self.lock:
+            return dict(
+                workers=self.workers,
+                queue_limit=self.queue_limit,
+                count=self.count,
+                avg_ms=round(1000 * self.total_time / self.count, 3) if self.count else 0,
+                max_ms=round(1000 * self.max_time, 3),
+                in_flight=self.in_flight,
+                peak_in_flight=self.peak_in_flight,
+                rejected=self.rejected,
+                restarts=self.restarts,
+                fallbacks=self.fallbacks,
+            )
+
+
+hasher = PasswordHasher()
@@ -0,0 +1,85 @@
+import threading
+import time
+from collections import OrderedDict
+from flask_login import UserMixin
+from models import db, User, Student, Teacher, Administrator
+
+
+# Данные текущего пользователя, нужные почти каждому запросу: роль и id связанной записи ученика,
+# преподавателя или администратора
+class Identity(UserMixin):
+    def __init__(self, id, role, login, id_student=None, id_teacher=None, id_administrator=None):
+        self.id = id
+        self.role = role
+        self.login = login
+        self.id_student = id_student
+        self.id_teacher = id_teacher
+        self.id_administrator = id_administrator
+
+
+def load_identity(id_user):
+    row = db.session.query(User.id, User.role, User.login, Student.id, Teacher.id, Administrator.id) \
+        .outerjoin(Student, Student.id_user == User.id) \
+        .outerjoin(Teacher, Teacher.id_user == User.id) \
+        .outerjoin(Administrator, Administrator.id_user == User.id) \
+        .filter(User.id == id_user).first()
+    if row is None:
+        return None
+    return Identity(*row)
+
+
+# LRU-кеш пользователей по id с ограниченным размером и временем жизни записи.
+# Время жизни ограничивает расхождение между процессами; в своём процессе записи сбрасываются сразу через invalidate
+class IdentityCache:
+    def __init__(self, app=None):
+        self.maxsize = 10000
+        self.ttl = 300
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.maxsize = int(app.config.get("IDENTITY_CACHE_SIZE", self.maxsize))
+        self.ttl = float(app.config.get("IDENTITY_CACHE_TTL", self.ttl))
+        app.extensions["identity_cache"] = self
+
+    def get(self, id_user):
+        now = time.monotonic()
+        with self.lock:
+            entry = self.entries.get(id_user)
+            if entry is not None and entry[0] > now:
+                self.entries.move_to_end(id_user)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+        identity = load_identity(id_user)
+        if identity is not None:
+            self.put(identity)
+        return identity
+
+    def put(self, identity):
+        if self.maxsize <= 0:
+            return
+        with self.lock:
+            self.entries[identity.id] = (time.monotonic() + self.ttl, identity)
+            self.entries.move_to_end(identity.id)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+    def invalidate(self, id_user):
+        with self.lock:
+            self.entries.pop(id_user, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self):
+        with self.lock:
+            return dict(size=len(self.entries), maxsize=self.maxsize, hits=self.hits, misses=self.misses)
+
+
+identity_cache = IdentityCache()
@@ -0,0 +1,47 @@
+import os
+import re
+from datetime import datetime
+from sqlalchemy import text
+from models import db, SchemaVersion
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migrations')
+
+
+# Список миграций: файлы вида 0001_name.sql, упорядоченные по номеру версии
+def migration_files():
+    result = []
+    for file_name in sorted(os.listdir(MIGRATIONS_DIR)):
+        match = re.match(r'^(\d+)_(\w+)\.sql$', file_name)
+        if match:
+            result.append((int(match.group(1)), match.group(2), os.path.join(MIGRATIONS_DIR, file_name)))
+    return result
+
+
+def split_statements(sql):
+    lines = [line for line in sql.splitlines() if not line.strip().startswith('--')]
+    return [statement.strip() for statement in '\n'.join(lines).split(';') if statement.strip()]
+
+
+# Создание недостающих таблиц и применение ещё не выполненных миграций, каждая в своей транзакции
+def upgrade():
+    db.create_all()
+    applied = {row.version for row in SchemaVersion.query.all()}
+    done = []
+    for version, name, path in migration_files():
+        if version in applied:
+            continue
+        with open(path, encoding='utf-8') as file:
+            statements = split_statements(file.read())
+        try:
+            if db.engine.dialect.name == 'postgresql':
+                # Создание индексов на больших таблицах может идти дольше DB_STATEMENT_TIMEOUT
+                db.session.execute(text('SET LOCAL statement_timeout = 0'))
+            for statement in statements:
+                db.session.execute(text(statement))
+            db.session.add(SchemaVersion(version=version, name=name, dateApplied=datetime.utcnow()))
+            db.session.commit()
+        except:
+            db.session.rollback()
+            raise
+        done.append((version, name))
+    return done
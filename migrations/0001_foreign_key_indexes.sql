@@ -0,0 +1,36 @@
+-- Индексы по внешним ключам таблиц результатов, назначений и связей
+-- Повторные оценки одного студента за одну работу удаляются (остаётся последняя),
+-- после чего на пару (студент, работа) ставится уникальный индекс
+
+DELETE FROM "ResultLabWork"
+WHERE id NOT IN (SELECT MAX(id) FROM "ResultLabWork" GROUP BY id_student, "id_LaboratoryWork");
+
+DELETE FROM "ResultControlWork"
+WHERE id NOT IN (SELECT MAX(id) FROM "ResultControlWork" GROUP BY id_student, "id_controlWork");
+
+CREATE UNIQUE INDEX IF NOT EXISTS "ux_ResultLabWork_id_student_id_LaboratoryWork"
+    ON "ResultLabWork" (id_student, "id_LaboratoryWork");
+CREATE INDEX IF NOT EXISTS "ix_ResultLabWork_id_student_id_discipline" ON "ResultLabWork" (id_student, id_discipline);
+CREATE INDEX IF NOT EXISTS "ix_ResultLabWork_id_LaboratoryWork" ON "ResultLabWork" ("id_LaboratoryWork");
+
+CREATE UNIQUE INDEX IF NOT EXISTS "ux_ResultControlWork_id_student_id_controlWork"
+    ON "ResultControlWork" (id_student, "id_controlWork");
+CREATE INDEX IF NOT EXISTS "ix_ResultControlWork_id_student_id_discipline" ON "ResultControlWork" (id_student, id_discipline);
+CREATE INDEX IF NOT EXISTS "ix_ResultControlWork_id_controlWork" ON "ResultControlWork" ("id_controlWork");
+
+CREATE INDEX IF NOT EXISTS "ix_WorkGroup_id_group_id_LaboratoryWork" ON "WorkGroup" (id_group, "id_LaboratoryWork");
+CREATE INDEX IF NOT EXISTS "ix_WorkGroup_id_LaboratoryWork" ON "WorkGroup" ("id_LaboratoryWork");
+
+CREATE INDEX IF NOT EXISTS "ix_TeacherGroup_id_teacher_id_group" ON "TeacherGroup" (id_teacher, id_group);
+CREATE INDEX IF NOT EXISTS "ix_TeacherGroup_id_group" ON "TeacherGroup" (id_group);
+
+CREATE INDEX IF NOT EXISTS "ix_TeacherDiscipline_id_teacher_id_discipline" ON "TeacherDiscipline" (id_teacher, id_discipline);
+CREATE INDEX IF NOT EXISTS "ix_TeacherDiscipline_id_discipline_id_teacher" ON "TeacherDiscipline" (id_discipline, id_teacher);
+
+CREATE INDEX IF NOT EXISTS "ix_Student_id_user" ON "Student" (id_user);
+CREATE INDEX IF NOT EXISTS "ix_Student_id_group_fullName" ON "Student" (id_group, "fullName");
+CREATE INDEX IF NOT EXISTS "ix_Teacher_id_user" ON "Teacher" (id_user);
+CREATE INDEX IF NOT EXISTS "ix_Administrator_id_user" ON "Administrator" (id_user);
+
+CREATE INDEX IF NOT EXISTS "ix_LaboratoryWork_id_discipline" ON "LaboratoryWork" (id_discipline);
+CREATE INDEX IF NOT EXISTS "ix_ControlWork_id_discipline" ON "ControlWork" (id_discipline);
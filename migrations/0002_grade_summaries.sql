@@ -0,0 +1,34 @@
+-- Таблицы итогов по ученикам и классам. После применения заполните их командой flask refresh-summaries
+
+CREATE TABLE IF NOT EXISTS "StudentSummary" (
+    id_student INTEGER NOT NULL REFERENCES "Student" (id),
+    id_discipline INTEGER NOT NULL REFERENCES "Discipline" (id),
+    id_group INTEGER REFERENCES "Group" (id),
+    "lwSubmitted" INTEGER NOT NULL DEFAULT 0,
+    "lwAccepted" INTEGER NOT NULL DEFAULT 0,
+    "lwGradeSum" INTEGER NOT NULL DEFAULT 0,
+    "lwOverdue" INTEGER NOT NULL DEFAULT 0,
+    "cwSubmitted" INTEGER NOT NULL DEFAULT 0,
+    "cwAccepted" INTEGER NOT NULL DEFAULT 0,
+    "cwGradeSum" INTEGER NOT NULL DEFAULT 0,
+    "cwOverdue" INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (id_student, id_discipline)
+);
+
+CREATE INDEX IF NOT EXISTS "ix_StudentSummary_id_group_id_discipline" ON "StudentSummary" (id_group, id_discipline);
+
+CREATE TABLE IF NOT EXISTS "GroupSummary" (
+    id_group INTEGER NOT NULL REFERENCES "Group" (id),
+    id_discipline INTEGER NOT NULL REFERENCES "Discipline" (id),
+    "lwAssigned" INTEGER NOT NULL DEFAULT 0,
+    "cwAssigned" INTEGER NOT NULL DEFAULT 0,
+    "lwSubmitted" INTEGER NOT NULL DEFAULT 0,
+    "lwAccepted" INTEGER NOT NULL DEFAULT 0,
+    "lwGradeSum" INTEGER NOT NULL DEFAULT 0,
+    "lwOverdue" INTEGER NOT NULL DEFAULT 0,
+    "cwSubmitted" INTEGER NOT NULL DEFAULT 0,
+    "cwAccepted" INTEGER NOT NULL DEFAULT 0,
+    "cwGradeSum" INTEGER NOT NULL DEFAULT 0,
+    "cwOverdue" INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (id_group, id_discipline)
+);
@@ -0,0 +1,22 @@
+-- Индексы по срокам сдачи для выборки работ с подходящим или истёкшим сроком и очередь уведомлений
+
+CREATE INDEX IF NOT EXISTS "ix_WorkGroup_deadline" ON "WorkGroup" (deadline);
+CREATE INDEX IF NOT EXISTS "ix_ControlWork_deadline" ON "ControlWork" (deadline);
+
+CREATE TABLE IF NOT EXISTS "Notification" (
+    id SERIAL PRIMARY KEY,
+    id_student INTEGER NOT NULL REFERENCES "Student" (id),
+    kind VARCHAR(10) NOT NULL,
+    "workType" VARCHAR(2) NOT NULL,
+    id_work INTEGER NOT NULL,
+    deadline DATE,
+    message VARCHAR(200),
+    "dateCreated" TIMESTAMP,
+    "dateSent" TIMESTAMP,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    "lastError" VARCHAR(200)
+);
+
+CREATE UNIQUE INDEX IF NOT EXISTS "ux_Notification_id_student_kind_workType_id_work"
+    ON "Notification" (id_student, kind, "workType", id_work);
+CREATE INDEX IF NOT EXISTS "ix_Notification_dateSent_id" ON "Notification" ("dateSent", id);
@@ -0,0 +1,8 @@
+-- Готовые данные профиля ученика. Заполняются при первом открытии профиля
+
+CREATE TABLE IF NOT EXISTS "StudentSnapshot" (
+    id_student INTEGER NOT NULL PRIMARY KEY REFERENCES "Student" (id),
+    version INTEGER NOT NULL DEFAULT 1,
+    "dateModified" TIMESTAMP NOT NULL,
+    data TEXT
+);
@@ -0,0 +1,18 @@
+-- Журнал изменений оценок
+
+CREATE TABLE IF NOT EXISTS "GradeAudit" (
+    id SERIAL PRIMARY KEY,
+    "dateCreated" TIMESTAMP NOT NULL,
+    id_user INTEGER REFERENCES "User" (id),
+    "workType" VARCHAR(2) NOT NULL,
+    id_work INTEGER NOT NULL,
+    id_discipline INTEGER REFERENCES "Discipline" (id),
+    id_student INTEGER NOT NULL REFERENCES "Student" (id),
+    "oldStatus" VARCHAR(20),
+    "oldGrade" INTEGER,
+    "newStatus" VARCHAR(20),
+    "newGrade" INTEGER
+);
+
+CREATE INDEX IF NOT EXISTS "ix_GradeAudit_id_student_dateCreated" ON "GradeAudit" (id_student, "dateCreated");
+CREATE INDEX IF NOT EXISTS "ix_GradeAudit_workType_id_work" ON "GradeAudit" ("workType", id_work);
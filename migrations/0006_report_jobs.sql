@@ -0,0 +1,19 @@
+-- Очередь построения отчётов по классам и дисциплинам
+
+CREATE TABLE IF NOT EXISTS "ReportJob" (
+    id SERIAL PRIMARY KEY,
+    id_user INTEGER REFERENCES "User" (id),
+    id_group INTEGER REFERENCES "Group" (id),
+    id_discipline INTEGER REFERENCES "Discipline" (id),
+    status VARCHAR(10) NOT NULL,
+    progress INTEGER NOT NULL DEFAULT 0,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    "fileName" VARCHAR(200),
+    "lastError" VARCHAR(200),
+    "dateCreated" TIMESTAMP NOT NULL,
+    "dateStarted" TIMESTAMP,
+    "dateHeartbeat" TIMESTAMP,
+    "dateFinished" TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS "ix_ReportJob_status_id" ON "ReportJob" (status, id);
@@ -0,0 +1,266 @@
+from flask_login import UserMixin
+from database import Database
+
+db = Database()
+
+
+class User(db.Model, UserMixin):
+    __tablename__ = 'User'
+    id = db.Column(db.Integer, primary_key=True)
+    role = db.Column(db.String(20))
+    login = db.Column(db.String(25), unique=True)
+    passwordHash = db.Column(db.String(300))
+
+
+class Group(db.Model):
+    __tablename__ = 'Group'
+    id = db.Column(db.Integer, primary_key=True)
+    number = db.Column(db.String(8), unique=True)
+
+
+class Student(db.Model, UserMixin):
+    __tablename__ = 'Student'
+    __table_args__ = (
+        db.Index('ix_Student_id_user', 'id_user'),
+        db.Index('ix_Student_id_group_fullName', 'id_group', 'fullName'),
+    )
+    id_user = db.Column(db.Integer, db.ForeignKey('User.id'))
+    id = db.Column(db.Integer, primary_key=True)
+    fullName = db.Column(db.String(120))
+    dateBirth = db.Column(db.Date)
+    id_group = db.Column(db.Integer, db.ForeignKey('Group.id'))
+
+
+class Teacher(db.Model, UserMixin):
+    __tablename__ = 'Teacher'
+    __table_args__ = (
+        db.Index('ix_Teacher_id_user', 'id_user'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    id_user = db.Column(db.Integer, db.ForeignKey('User.id'))
+    fullName = db.Column(db.String(120))
+    dateBirth = db.Column(db.Date)
+    qualification = db.Column(db.String(50))
+
+
+class Administrator(db.Model, UserMixin):
+    __tablename__ = "Administrator"
+    __table_args__ = (
+        db.Index('ix_Administrator_id_user', 'id_user'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    id_user = db.Column(db.Integer, db.ForeignKey('User.id'))
+    fullName = db.Column(db.String(120))
+
+
+class TeacherGroup(db.Model):
+    __tablename__ = 'TeacherGroup'
+    __table_args__ = (
+        db.Index('ix_TeacherGroup_id_teacher_id_group', 'id_teacher', 'id_group'),
+        db.Index('ix_TeacherGroup_id_group', 'id_group'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    id_group = db.Column(db.Integer, db.ForeignKey('Group.id'))
+    id_teacher = db.Column(db.Integer, db.ForeignKey('Teacher.id'))
+
+
+class Discipline(db.Model):
+    __tablename__ = 'Discipline'
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(50), unique=True)
+
+
+class TeacherDiscipline(db.Model):
+    __tablename__ = 'TeacherDiscipline'
+    __table_args__ = (
+        db.Index('ix_TeacherDiscipline_id_teacher_id_discipline', 'id_teacher', 'id_discipline'),
+        db.Index('ix_TeacherDiscipline_id_discipline_id_teacher', 'id_discipline', 'id_teacher'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    id_teacher = db.Column(db.Integer, db.ForeignKey('Teacher.id'))
+    id_discipline = db.Column(db.Integer, db.ForeignKey('Discipline.id'))
+
+
+class LaboratoryWork(db.Model):
+    __tablename__ = 'LaboratoryWork'
+    __table_args__ = (
+        db.Index('ix_LaboratoryWork_id_discipline', 'id_discipline'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    number = db.Column(db.Integer)
+    name = db.Column(db.String(50), unique=True)
+    id_discipline = db.Column(db.Integer, db.ForeignKey('Discipline.id'))
+
+
+class WorkGroup(db.Model):
+    __tablename__ = 'WorkGroup'
+    __table_args__ = (
+        db.Index('ix_WorkGroup_id_group_id_LaboratoryWork', 'id_group', 'id_LaboratoryWork'),
+        db.Index('ix_WorkGroup_id_LaboratoryWork', 'id_LaboratoryWork'),
+        db.Index('ix_WorkGroup_deadline', 'deadline'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    deadline = db.Column(db.Date)
+    id_LaboratoryWork = db.Column(db.Integer, db.ForeignKey('LaboratoryWork.id'))
+    id_discipline = db.Column(db.Integer, db.ForeignKey('Discipline.id'))
+    id_group = db.Column(db.Integer, db.ForeignKey('Group.id'))
+
+
+class ResultLabWork(db.Model):
+    __tablename__ = 'ResultLabWork'
+    __table_args__ = (
+        db.Index('ux_ResultLabWork_id_student_id_LaboratoryWork', 'id_student', 'id_LaboratoryWork', unique=True),
+        db.Index('ix_ResultLabWork_id_student_id_discipline', 'id_student', 'id_discipline'),
+        db.Index('ix_ResultLabWork_id_LaboratoryWork', 'id_LaboratoryWork'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    status = db.Column(db.String(20))
+    grade = db.Column(db.Integer)
+    id_LaboratoryWork = db.Column(db.Integer, db.ForeignKey('LaboratoryWork.id'))
+    id_discipline = db.Column(db.Integer, db.ForeignKey('Discipline.id'))
+    id_student = db.Column(db.Integer, db.ForeignKey('Student.id'))
+
+
+class ControlWork(db.Model):
+    __tablename__ = 'ControlWork'
+    __table_args__ = (
+        db.Index('ix_ControlWork_id_discipline', 'id_discipline'),
+        db.Index('ix_ControlWork_deadline', 'deadline'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    number = db.Column(db.Integer)
+    name = db.Column(db.String(50), unique=True)
+    deadline = db.Column(db.Date)
+    id_discipline = db.Column(db.Integer, db.ForeignKey('Discipline.id'))
+
+
+class ResultControlWork(db.Model):
+    __tablename__ = 'ResultControlWork'
+    __table_args__ = (
+        db.Index('ux_ResultControlWork_id_student_id_controlWork', 'id_student', 'id_controlWork', unique=True),
+        db.Index('ix_ResultControlWork_id_student_id_discipline', 'id_student', 'id_discipline'),
+        db.Index('ix_ResultControlWork_id_controlWork', 'id_controlWork'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    status = db.Column(db.String(20))
+    grade = db.Column(db.Integer)
+    id_controlWork = db.Column(db.Integer, db.ForeignKey('ControlWork.id'))
+    id_discipline = db.Column(db.Integer, db.ForeignKey('Discipline.id'))
+    id_student = db.Column(db.Integer, db.ForeignKey('Student.id'))
+
+
+class SchemaVersion(db.Model):
+    __tablename__ = 'SchemaVersion'
+    version = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    name = db.Column(db.String(100))
+    dateApplied = db.Column(db.DateTime)
+
+
+# Итоги по ученику и дисциплине; обновляются при выставлении оценок (summary.py)
+class StudentSummary(db.Model):
+    __tablename__ = 'StudentSummary'
+    __table_args__ = (
+        db.Index('ix_StudentSummary_id_group_id_discipline', 'id_group', 'id_discipline'),
+    )
+    id_student = db.Column(db.Integer, db.ForeignKey('Student.id'), primary_key=True, autoincrement=False)
+    id_discipline = db.Column(db.Integer, db.ForeignKey('Discipline.id'), primary_key=True, autoincrement=False)
+    id_group = db.Column(db.Integer, db.ForeignKey('Group.id'))
+    lwSubmitted = db.Column(db.Integer, nullable=False, default=0)
+    lwAccepted = db.Column(db.Integer, nullable=False, default=0)
+    lwGradeSum = db.Column(db.Integer, nullable=False, default=0)
+    lwOverdue = db.Column(db.Integer, nullable=False, default=0)
+    cwSubmitted = db.Column(db.Integer, nullable=False, default=0)
+    cwAccepted = db.Column(db.Integer, nullable=False, default=0)
+    cwGradeSum = db.Column(db.Integer, nullable=False, default=0)
+    cwOverdue = db.Column(db.Integer, nullable=False, default=0)
+
+
+# Итоги по классу и дисциплине: число заданных работ и суммы итогов учеников класса
+class GroupSummary(db.Model):
+    __tablename__ = 'GroupSummary'
+    id_group = db.Column(db.Integer, db.ForeignKey('Group.id'), primary_key=True, autoincrement=False)
+    id_discipline = db.Column(db.Integer, db.ForeignKey('Discipline.id'), primary_key=True, autoincrement=False)
+    lwAssigned = db.Column(db.Integer, nullable=False, default=0)
+    cwAssigned = db.Column(db.Integer, nullable=False, default=0)
+    lwSubmitted = db.Column(db.Integer, nullable=False, default=0)
+    lwAccepted = db.Column(db.Integer, nullable=False, default=0)
+    lwGradeSum = db.Column(db.Integer, nullable=False, default=0)
+    lwOverdue = db.Column(db.Integer, nullable=False, default=0)
+    cwSubmitted = db.Column(db.Integer, nullable=False, default=0)
+    cwAccepted = db.Column(db.Integer, nullable=False, default=0)
+    cwGradeSum = db.Column(db.Integer, nullable=False, default=0)
+    cwOverdue = db.Column(db.Integer, nullable=False, default=0)
+
+
+# Очередь уведомлений о сроках сдачи (notifications.py). На одну работу ученик получает не больше одного уведомления
+# каждого вида; отправленные отмечаются датой dateSent
+class Notification(db.Model):
+    __tablename__ = 'Notification'
+    __table_args__ = (
+        db.Index('ux_Notification_id_student_kind_workType_id_work', 'id_student', 'kind', 'workType', 'id_work',
+                 unique=True),
+        db.Index('ix_Notification_dateSent_id', 'dateSent', 'id'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    id_student = db.Column(db.Integer, db.ForeignKey('Student.id'), nullable=False)
+    kind = db.Column(db.String(10), nullable=False)
+    workType = db.Column(db.String(2), nullable=False)
+    id_work = db.Column(db.Integer, nullable=False)
+    deadline = db.Column(db.Date)
+    message = db.Column(db.String(200))
+    dateCreated = db.Column(db.DateTime)
+    dateSent = db.Column(db.DateTime)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    lastError = db.Column(db.String(200))
+
+
+# Готовые данные профиля ученика (его оценки) в формате JSON; version увеличивается при каждом изменении оценок
+# ученика, data пусто, пока данные не собраны заново (snapshots.py)
+class StudentSnapshot(db.Model):
+    __tablename__ = 'StudentSnapshot'
+    id_student = db.Column(db.Integer, db.ForeignKey('Student.id'), primary_key=True, autoincrement=False)
+    version = db.Column(db.Integer, nullable=False, default=1)
+    dateModified = db.Column(db.DateTime, nullable=False)
+    data = db.Column(db.Text)
+
+
+# Журнал изменений оценок: только добавление записей (audit.py)
+class GradeAudit(db.Model):
+    __tablename__ = 'GradeAudit'
+    __table_args__ = (
+        db.Index('ix_GradeAudit_id_student_dateCreated', 'id_student', 'dateCreated'),
+        db.Index('ix_GradeAudit_workType_id_work', 'workType', 'id_work'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    dateCreated = db.Column(db.DateTime, nullable=False)
+    id_user = db.Column(db.Integer, db.ForeignKey('User.id'))
+    workType = db.Column(db.String(2), nullable=False)
+    id_work = db.Column(db.Integer, nullable=False)
+    id_discipline = db.Column(db.Integer, db.ForeignKey('Discipline.id'))
+    id_student = db.Column(db.Integer, db.ForeignKey('Student.id'), nullable=False)
+    oldStatus = db.Column(db.String(20))
+    oldGrade = db.Column(db.Integer)
+    newStatus = db.Column(db.String(20))
+    newGrade = db.Column(db.Integer)
+
+
+# Очередь построения отчётов: задания выполняет команда flask report-worker (reports.py). Пустые id_group и
+# id_discipline означают все классы и все дисциплины
+class ReportJob(db.Model):
+    __tablename__ = 'ReportJob'
+    __table_args__ = (
+        db.Index('ix_ReportJob_status_id', 'status', 'id'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    id_user = db.Column(db.Integer, db.ForeignKey('User.id'))
+    id_group = db.Column(db.Integer, db.ForeignKey('Group.id'))
+    id_discipline = db.Column(db.Integer, db.ForeignKey('Discipline.id'))
+    status = db.Column(db.String(10), nullable=False)
+    progress = db.Column(db.Integer, nullable=False, default=0)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    fileName = db.Column(db.String(200))
+    lastError = db.Column(db.String(200))
+    dateCreated = db.Column(db.DateTime, nullable=False)
+    dateStarted = db.Column(db.DateTime)
+    dateHeartbeat = db.Column(db.DateTime)
+    dateFinished = db.Column(db.DateTime)
@@ -0,0 +1,195 @@
+import importlib
+import logging
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import and_
+from models import db, Student, LaboratoryWork, WorkGroup, ResultLabWork, ControlWork, ResultControlWork, \
+    Notification
+from summary import group_disciplines
+import repository
+
+logger = logging.getLogger(__name__)
+
+MESSAGES = {
+    ("due", "lw"): "Срок сдачи проверочной работы «%s» — %s",
+    ("due", "cw"): "Срок сдачи контрольной работы «%s» — %s",
+    ("overdue", "lw"): "Проверочная работа «%s» не сдана, срок сдачи истёк %s",
+    ("overdue", "cw"): "Контрольная работа «%s» не сдана, срок сдачи истёк %s",
+}
+KEY = ("id_student", "kind", "workType", "id_work")
+
+
+# Ученики, не сдавшие ПР класса со сроком сдачи в [start, end). Работы выбираются по индексу ix_WorkGroup_deadline,
+# поэтому просматриваются только назначения из окна, а не все ученики и работы
+def lab_work_deadlines(start, end):
+    return db.session.query(Student.id, WorkGroup.id_LaboratoryWork, LaboratoryWork.name, WorkGroup.deadline) \
+        .select_from(WorkGroup) \
+        .join(LaboratoryWork, WorkGroup.id_LaboratoryWork == LaboratoryWork.id) \
+        .join(Student, Student.id_group == WorkGroup.id_group) \
+        .outerjoin(ResultLabWork, and_(ResultLabWork.id_student == Student.id,
+                                       ResultLabWork.id_LaboratoryWork == WorkGroup.id_LaboratoryWork)) \
+        .filter(WorkGroup.deadline >= start, WorkGroup.deadline < end, ResultLabWork.id.is_(None))
+
+
+def control_work_deadlines(start, end):
+    pairs = group_disciplines()
+    return db.session.query(Student.id, ControlWork.id, ControlWork.name, ControlWork.deadline) \
+        .select_from(ControlWork) \
+        .join(pairs, pairs.c.id_discipline == ControlWork.id_discipline) \
+        .join(Student, Student.id_group == pairs.c.id_group) \
+        .outerjoin(ResultControlWork, and_(ResultControlWork.id_student == Student.id,
+                                           ResultControlWork.id_controlWork == ControlWork.id)) \
+        .filter(ControlWork.deadline >= start, ControlWork.deadline < end, ResultControlWork.id.is_(None))
+
+
+# Запись уведомлений в очередь; уже созданные ранее (тот же ученик, вид и работа) пропускаются
+def save(rows):
+    if not rows:
+        return 0
+    statement = repository.upsert_insert(Notification.__table__)
+    if statement is None:
+        ids = {row["id_student"] for row in rows}
+        existing = set(db.session.query(Notification.id_student, Notification.kind, Notification.workType,
+                                        Notification.id_work).filter(Notification.id_student.in_(ids)))
+        rows = [row for row in rows if tuple(row[key] for key in KEY) not in existing]
+        db.session.bulk_insert_mappings(Notification, rows)
+        return len(rows)
+    statement = statement.values(rows).on_conflict_do_nothing(index_elements=list(KEY))
+    return db.session.execute(statement).rowcount
+
+
+# Уведомления о работах, срок сдачи которых наступит в ближайшие due_hours часов, и о работах с истёкшим за последние
+# overdue_days дней сроком, которые ученик не сдал
+def generate(now=None, due_hours=48, overdue_days=7, batch_size=1000):
+    now = now or datetime.now()
+    today = now.date()
+    windows = (
+        ("due", today, (now + timedelta(hours=due_hours)).date() + timedelta(days=1)),
+        ("overdue", today - timedelta(days=overdue_days), today),
+    )
+    created = 0
+    rows = []
+    for kind, start, end in windows:
+        for work_type, query in (("lw", lab_work_deadlines(start, end)), ("cw", control_work_deadlines(start, end))):
+            for id_student, id_work, name, deadline in query.all():
+                rows.append(dict(
+                    id_student=id_student,
+                    kind=kind,
+                    workType=work_type,
+                    id_work=id_work,
+                    deadline=deadline,
+                    message=MESSAGES[(kind, work_type)] % (name, deadline.strftime("%d.%m.%Y")),
+                    dateCreated=now,
+                    attempts=0,
+                ))
+                if len(rows) >= batch_size:
+                    created += save(rows)
+                    rows = []
+    created += save(rows)
+    return created
+
+
+# Доставка по умолчанию: запись в журнал приложения
+class LogDelivery:
+    def send(self, notification):
+        logger.info("Уведомление ученику %d: %s", notification.id_student, notification.message)
+
+
+# Способ доставки задаётся строкой "модуль:класс"; у объекта класса должен быть метод send(notification),
+# который при неудаче вызывает исключение
+def create_delivery(name):
+    if not name or name == "log":
+        return LogDelivery()
+    module_name, _, class_name = name.partition(":")
+    return getattr(importlib.import_module(module_name), class_name)()
+
+
+# Отправка неотправленных уведомлений пачкой. На PostgreSQL строки блокируются с SKIP LOCKED,
+# поэтому несколько обработчиков не отправят одно уведомление дважды
+def deliver(delivery, batch_size=100, max_attempts=5):
+    notifications = Notification.query \
+        .filter(Notification.dateSent.is_(None), Notification.attempts < max_attempts) \
+        .order_by(Notification.id).limit(batch_size) \
+        .with_for_update(skip_locked=True).all()
+    sent = 0
+    for notification in notifications:
+        notification.attempts += 1
+        try:
+            delivery.send(notification)
+        except Exception as e:
+            notification.lastError = str(e)[:200]
+            logger.warning("Не удалось отправить уведомление %d: %s", notification.id, e)
+        else:
+            notification.dateSent = datetime.now()
+            notification.lastError = None
+            sent += 1
+    db.session.commit()
+    return sent, len(notifications)
+
+
+# Фоновый обработчик: раз в scan_interval секунд ищет работы с подходящим или истёкшим сроком,
+# раз в interval секунд отправляет накопившиеся уведомления. Запускается командой flask notify
+class Notifier:
+    def __init__(self, app=None):
+        self.due_hours = 48
+        self.overdue_days = 7
+        self.interval = 60
+        self.scan_interval = 3600
+        self.batch_size = 100
+        self.max_attempts = 5
+        self.delivery_name = "log"
+        self.delivery = None
+        self.last_scan = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.due_hours = int(app.config.get("NOTIFY_DUE_HOURS", self.due_hours))
+        self.overdue_days = int(app.config.get("NOTIFY_OVERDUE_DAYS", self.overdue_days))
+        self.interval = float(app.config.get("NOTIFY_INTERVAL", self.interval))
+        self.scan_interval = float(app.config.get("NOTIFY_SCAN_INTERVAL", self.scan_interval))
+        self.batch_size = int(app.config.get("NOTIFY_BATCH_SIZE", self.batch_size))
+        self.max_attempts = int(app.config.get("NOTIFY_MAX_ATTEMPTS", self.max_attempts))
+        self.delivery_name = app.config.get("NOTIFY_DELIVERY", self.delivery_name)
+        self.delivery = None
+        app.extensions["notifier"] = self
+
+    # Способ отправки создаётся при первой отправке: веб-процессам, которые только читают уведомления, он не нужен
+    def get_delivery(self):
+        if self.delivery is None:
+            self.delivery = create_delivery(self.delivery_name)
+        return self.delivery
+
+    def scan(self):
+        created = generate(due_hours=self.due_hours, overdue_days=self.overdue_days)
+        db.session.commit()
+        self.last_scan = time.monotonic()
+        return created
+
+    def deliver_pending(self):
+        total = 0
+        while True:
+            sent, taken = deliver(self.get_delivery(), self.batch_size, self.max_attempts)
+            total += sent
+            if taken < self.batch_size or sent == 0:
+                return total
+
+    def run_once(self):
+        created = 0
+        if self.last_scan is None or time.monotonic() - self.last_scan >= self.scan_interval:
+            created = self.scan()
+        return created, self.deliver_pending()
+
+    def run(self):
+        while True:
+            try:
+                created, sent = self.run_once()
+                if created or sent:
+                    logger.info("Уведомлений создано: %d, отправлено: %d", created, sent)
+            except Exception:
+                db.session.rollback()
+                logger.exception("Ошибка обработки уведомлений")
+            time.sleep(self.interval)
+
+
+notifier = Notifier()
@@ -0,0 +1,129 @@
+import base64
+import json
+from urllib.parse import urlencode
+from flask import request
+from sqlalchemy import tuple_
+
+PER_PAGE = 50
+MAX_PER_PAGE = 500
+
+
+def encode_cursor(values):
+    data = json.dumps(values, default=str, ensure_ascii=False).encode("utf-8")
+    return base64.urlsafe_b64encode(data).decode("ascii").rstrip("=")
+
+
+# Значение ключа сортировки из курсора должно подходить к типу столбца: число для числовых столбцов, строка
+# для остальных (даты в курсоре хранятся строкой)
+def valid_key(column, value):
+    try:
+        python_type = column.type.python_type
+    except NotImplementedError:
+        python_type = None
+    if isinstance(value, bool):
+        return False
+    if python_type is int:
+        return isinstance(value, int)
+    if python_type is float:
+        return isinstance(value, (int, float))
+    return isinstance(value, str)
+
+
+# Курсор [значение ключа сортировки, id] или None (первая страница), если курсора нет или он не подходит к столбцу
+def decode_cursor(cursor, sort_column=None):
+    if not cursor:
+        return None
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except ValueError:
+        return None
+    if not isinstance(values, list) or len(values) != 2:
+        return None
+    if not isinstance(values[1], int) or isinstance(values[1], bool):
+        return None
+    if sort_column is not None and not valid_key(sort_column, values[0]):
+        return None
+    return values
+
+
+class Page:
+    def __init__(self, items, next_cursor, prev_cursor, sort, order, q):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+        self.sort = sort
+        self.order = order
+        self.q = q
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+    # Адрес той же страницы с другим курсором; остальные параметры запроса сохраняются
+    def url(self, **params):
+        args = {key: value for key, value in request.args.items() if key not in ("after", "before")}
+        args.update({key: value for key, value in params.items() if value is not None})
+        return request.path + ("?" + urlencode(args) if args else "")
+
+    @property
+    def next_url(self):
+        return self.url(after=self.next_cursor) if self.next_cursor else None
+
+    @property
+    def prev_url(self):
+        return self.url(before=self.prev_cursor) if self.prev_cursor else None
+
+
+def per_page_arg():
+    try:
+        return max(1, min(int(request.args.get("per_page", PER_PAGE)), MAX_PER_PAGE))
+    except ValueError:
+        return PER_PAGE
+
+
+# Постраничный вывод по ключу (keyset): вместо OFFSET условие "(поле сортировки, id) больше последнего показанного",
+# поэтому стоимость страницы не зависит от её номера. Параметры берутся из строки запроса:
+# sort (одно из имён в sorts), order (asc/desc), after/before (курсоры), per_page
+def paginate(query, sorts, default_sort, id_column):
+    sort = request.args.get("sort")
+    if sort not in sorts:
+        sort = default_sort
+    order = "desc" if request.args.get("order") == "desc" else "asc"
+    sort_column = sorts[sort]
+    per_page = per_page_arg()
+    after = decode_cursor(request.args.get("after"), sort_column)
+    before = decode_cursor(request.args.get("before"), sort_column)
+    backwards = before is not None and after is None
+    cursor = before if backwards else after
+    descending = (order == "desc") != backwards
+
+    query = query.add_columns(sort_column.label("sort_key"), id_column.label("sort_id"))
+    if cursor is not None:
+        key = tuple_(sort_column, id_column)
+        query = query.filter(key < tuple_(*cursor) if descending else key > tuple_(*cursor))
+    if descending:
+        query = query.order_by(sort_column.desc(), id_column.desc())
+    else:
+        query = query.order_by(sort_column.asc(), id_column.asc())
+    rows = query.limit(per_page + 1).all()
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+    if backwards:
+        rows.reverse()
+    next_cursor = None
+    prev_cursor = None
+    if rows:
+        if has_more or backwards:
+            next_cursor = encode_cursor([rows[-1].sort_key, rows[-1].sort_id])
+        if (cursor is not None and not backwards) or (backwards and has_more):
+            prev_cursor = encode_cursor([rows[0].sort_key, rows[0].sort_id])
+    return Page(rows, next_cursor, prev_cursor, sort, order, request.args.get("q", ""))
+
+
+def search_pattern():
+    q = request.args.get("q", "").strip()
+    if not q:
+        return None
+    return "%" + q.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
@@ -0,0 +1,260 @@
+import hmac
+import logging
+import threading
+import time
+from collections import defaultdict, deque
+from flask import Response, current_app, g, has_request_context, jsonify, request
+from flask_login import current_user
+from jinja2 import Template
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from models import db
+
+logger = logging.getLogger(__name__)
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+PREFIX = "schoolsystem_"
+
+
+# Показатели одного запроса: число SQL-команд и строк, время в БД и в шаблонах, самая долгая команда
+class RequestStats:
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.statements = 0
+        self.rows = 0
+        self.sql_time = 0.0
+        self.render_time = 0.0
+        self.slowest = None
+
+
+def current_stats():
+    if has_request_context():
+        return g.get("profile")
+    return None
+
+
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if current_stats() is not None:
+        context.profile_start = time.perf_counter()
+
+
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = current_stats()
+    start = getattr(context, "profile_start", None)
+    if stats is None or start is None:
+        return
+    elapsed = time.perf_counter() - start
+    stats.statements += 1
+    stats.sql_time += elapsed
+    if cursor.rowcount > 0:
+        stats.rows += cursor.rowcount
+    if not executemany and (stats.slowest is None or elapsed > stats.slowest[0]):
+        stats.slowest = (elapsed, statement, parameters)
+
+
+# Шаблон, который прибавляет время отрисовки к показателям текущего запроса
+class ProfiledTemplate(Template):
+    def render(self, *args, **kwargs):
+        stats = current_stats()
+        if stats is None:
+            return super().render(*args, **kwargs)
+        start = time.perf_counter()
+        try:
+            return super().render(*args, **kwargs)
+        finally:
+            stats.render_time += time.perf_counter() - start
+
+
+# План самой долгой команды SELECT медленного запроса (без выполнения самой команды)
+def explain(statement, parameters):
+    if not statement.lstrip().upper().startswith("SELECT"):
+        return None
+    engine = db.engine
+    prefix = "EXPLAIN QUERY PLAN " if engine.dialect.name == "sqlite" else "EXPLAIN "
+    try:
+        with engine.connect() as connection:
+            rows = connection.exec_driver_sql(prefix + statement, parameters).fetchall()
+    except Exception as e:
+        return "EXPLAIN не выполнен: %s" % e
+    return "\n".join(str(row[-1]) for row in rows)
+
+
+def label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+# Накопленные показатели по обработчикам (endpoint) для /metrics в формате Prometheus
+class Metrics:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests = defaultdict(int)
+        self.endpoints = {}
+
+    def observe(self, endpoint, method, status, duration, stats, slow):
+        with self.lock:
+            self.requests[(endpoint, method, status)] += 1
+            data = self.endpoints.get(endpoint)
+            if data is None:
+                data = self.endpoints[endpoint] = dict(
+                    count=0, duration=0.0, buckets=[0] * len(BUCKETS), statements=0, rows=0, sql_time=0.0,
+                    render_time=0.0, slow=0,
+                )
+            data["count"] += 1
+            data["duration"] += duration
+            for i, bound in enumerate(BUCKETS):
+                if duration <= bound:
+                    data["buckets"][i] += 1
+            data["statements"] += stats.statements
+            data["rows"] += stats.rows
+            data["sql_time"] += stats.sql_time
+            data["render_time"] += stats.render_time
+            data["slow"] += int(slow)
+
+    def render(self, extra=()):
+        lines = []
+
+        def metric(name, kind, help_text, samples):
+            lines.append("# HELP %s%s %s" % (PREFIX, name, help_text))
+            lines.append("# TYPE %s%s %s" % (PREFIX, name, kind))
+            for suffix, labels, value in samples:
+                text = ",".join('%s="%s"' % (key, label(value)) for key, value in labels)
+                lines.append("%s%s%s%s %s" % (PREFIX, name, suffix, "{%s}" % text if text else "", repr(value)))
+
+        with self.lock:
+            requests = sorted(self.requests.items())
+            endpoints = sorted((endpoint, dict(data, buckets=list(data["buckets"])))
+                               for endpoint, data in self.endpoints.items())
+        metric("http_requests_total", "counter", "HTTP requests by endpoint, method and status",
+               [("", (("endpoint", e), ("method", m), ("status", s)), n) for (e, m, s), n in requests])
+        samples = []
+        for endpoint, data in endpoints:
+            for bound, count in zip(BUCKETS, data["buckets"]):
+                samples.append(("_bucket", (("endpoint", endpoint), ("le", bound)), count))
+            samples.append(("_bucket", (("endpoint", endpoint), ("le", "+Inf")), data["count"]))
+            samples.append(("_sum", (("endpoint", endpoint),), data["duration"]))
+            samples.append(("_count", (("endpoint", endpoint),), data["count"]))
+        metric("http_request_duration_seconds", "histogram", "Request processing time", samples)
+        for name, key, help_text in (
+                ("db_statements_total", "statements", "SQL statements executed"),
+                ("db_rows_total", "rows", "Rows reported by the database driver"),
+                ("db_seconds_total", "sql_time", "Time spent executing SQL"),
+                ("render_seconds_total", "render_time", "Time spent rendering templates"),
+                ("slow_requests_total", "slow", "Requests slower than PROFILING_SLOW_MS")):
+            metric(name, "counter", help_text, [("", (("endpoint", e),), data[key]) for e, data in endpoints])
+        for name, kind, help_text, samples in extra:
+            metric(name, kind, help_text, samples)
+        return "\n".join(lines) + "\n"
+
+
+# Замеры запросов: включаются настройкой PROFILING. Если она выключена, не подключается ни один обработчик событий,
+# поэтому замеры ничего не стоят
+class Profiler:
+    def __init__(self, app=None):
+        self.enabled = False
+        self.slow_seconds = 0.5
+        self.explain = True
+        self.metrics = Metrics()
+        self.slow_requests = deque(maxlen=50)
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.enabled = bool(app.config.get("PROFILING"))
+        if not self.enabled:
+            return
+        self.slow_seconds = float(app.config.get("PROFILING_SLOW_MS", 500)) / 1000
+        self.explain = bool(app.config.get("PROFILING_EXPLAIN", True))
+        self.slow_requests = deque(maxlen=int(app.config.get("PROFILING_SLOW_KEEP", 50)))
+        if not event.contains(Engine, "before_cursor_execute", before_cursor_execute):
+            event.listen(Engine, "before_cursor_execute", before_cursor_execute)
+            event.listen(Engine, "after_cursor_execute", after_cursor_execute)
+        app.jinja_env.template_class = ProfiledTemplate
+        app.before_request(self.start_request)
+        app.after_request(self.finish_request)
+        app.add_url_rule("/metrics", "metrics", self.metrics_view)
+        app.add_url_rule("/metrics/slow", "slow_requests", self.slow_view)
+        app.extensions["profiler"] = self
+
+    def start_request(self):
+        g.profile = RequestStats()
+
+    def finish_request(self, response):
+        stats = g.pop("profile", None)
+        if stats is None:
+            return response
+        duration = time.perf_counter() - stats.start
+        endpoint = request.endpoint or "unknown"
+        slow = duration >= self.slow_seconds
+        self.metrics.observe(endpoint, request.method, response.status_code, duration, stats, slow)
+        response.headers["Server-Timing"] = "db;dur=%.1f, render;dur=%.1f, total;dur=%.1f" % (
+            stats.sql_time * 1000, stats.render_time * 1000, duration * 1000)
+        if slow:
+            self.report_slow(endpoint, duration, stats)
+        return response
+
+    # Медленный запрос: запись в журнал и в список последних медленных запросов (/metrics/slow).
+    # Значения параметров SQL не сохраняются, они нужны только для EXPLAIN
+    def report_slow(self, endpoint, duration, stats):
+        record = dict(
+            time=time.strftime("%Y-%m-%d %H:%M:%S"),
+            endpoint=endpoint,
+            method=request.method,
+            path=request.path,
+            duration_ms=round(duration * 1000, 1),
+            statements=stats.statements,
+            rows=stats.rows,
+            sql_ms=round(stats.sql_time * 1000, 1),
+            render_ms=round(stats.render_time * 1000, 1),
+            slowest_sql=None,
+            slowest_sql_ms=None,
+            plan=None,
+        )
+        if stats.slowest is not None:
+            elapsed, statement, parameters = stats.slowest
+            record.update(slowest_sql=statement, slowest_sql_ms=round(elapsed * 1000, 1))
+            if self.explain:
+                record["plan"] = explain(statement, parameters)
+        self.slow_requests.append(record)
+        logger.warning("Медленный запрос %s %s: %.1f мс, SQL-команд %d (%.1f мс), шаблоны %.1f мс\n%s\n%s",
+                       record["method"], record["path"], record["duration_ms"], record["statements"],
+                       record["sql_ms"], record["render_ms"], record["slowest_sql"] or "", record["plan"] or "")
+
+    # Доступ: администратору или по токену METRICS_TOKEN (для сборщика метрик). /metrics/slow показывает текст SQL
+    # и планы запросов, поэтому без токена адреса недоступны остальным пользователям
+    def allowed(self):
+        token = current_app.config.get("METRICS_TOKEN")
+        if token and hmac.compare_digest(request.headers.get("Authorization", ""), "Bearer " + token):
+            return True
+        return current_user.is_authenticated and current_user.role == "администратор"
+
+    def metrics_view(self):
+        if not self.allowed():
+            return Response("unauthorized\n", status=401, mimetype="text/plain")
+        extra = []
+        for name in ("identity_cache", "reference_cache", "fragment_cache", "snapshot_cache"):
+            cache = current_app.extensions.get(name)
+            if cache is not None:
+                stats = cache.stats()
+                extra.append(("%s_hits_total" % name, "counter", "Cache hits", [("", (), stats["hits"])]))
+                extra.append(("%s_misses_total" % name, "counter", "Cache misses", [("", (), stats["misses"])]))
+                extra.append(("%s_size" % name, "gauge", "Cached entries", [("", (), stats["size"])]))
+        audit = current_app.extensions.get("audit_log")
+        if audit is not None:
+            stats = audit.stats()
+            extra.append(("audit_written_total", "counter", "Grade audit records written",
+                          [("", (), stats["written"])]))
+            extra.append(("audit_overflow_total", "counter", "Grade audit records written synchronously "
+                          "because the queue was full", [("", (), stats["overflow"])]))
+            extra.append(("audit_lost_total", "counter", "Grade audit records that could not be written",
+                          [("", (), stats["lost"])]))
+            extra.append(("audit_queue_size", "gauge", "Grade audit records waiting in the queue",
+                          [("", (), stats["size"])]))
+        return Response(self.metrics.render(extra), mimetype="text/plain; version=0.0.4")
+
+    def slow_view(self):
+        if not self.allowed():
+            return Response("unauthorized\n", status=401, mimetype="text/plain")
+        return jsonify(list(self.slow_requests))
+
+
+profiler = Profiler()
@@ -0,0 +1,276 @@
+import csv
+import logging
+import os
+import time
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from sqlalchemy import and_, case, func
+from models import db, Group, Discipline, Student, WorkGroup, ResultLabWork, ControlWork, ResultControlWork, \
+    ReportJob
+from summary import ACCEPTED, WORKS, group_disciplines
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+STATUS_NAMES = {
+    QUEUED: "в очереди",
+    RUNNING: "выполняется",
+    DONE: "готов",
+    FAILED: "ошибка",
+}
+GRADES = (1, 2, 3, 4, 5)
+HEADER = ("group", "discipline", "workType", "students", "assigned", "expected", "submitted", "accepted",
+          "completionRate", "overdue", "averageGrade") + tuple("grade_%d" % grade for grade in GRADES)
+
+
+# Задание на построение отчёта (в транзакции запроса, фиксирует вызывающий)
+def enqueue(id_user, id_group=None, id_discipline=None):
+    job = ReportJob(id_user=id_user, id_group=id_group, id_discipline=id_discipline, status=QUEUED, progress=0,
+                    attempts=0, dateCreated=datetime.now())
+    db.session.add(job)
+    db.session.flush()
+    return job.id
+
+
+# Последние задания для страницы администратора: (задание, номер класса, название дисциплины)
+def recent_jobs(limit=10):
+    return db.session.query(ReportJob, Group.number, Discipline.name) \
+        .outerjoin(Group, ReportJob.id_group == Group.id) \
+        .outerjoin(Discipline, ReportJob.id_discipline == Discipline.id) \
+        .order_by(ReportJob.id.desc()).limit(limit).all()
+
+
+def chunks(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+# Итоги по работам одного вида для части классов: счётчики по (id класса, id дисциплины). Оценки, сдачи и
+# просрочки считаются в БД запросами с GROUP BY, в Python переносятся только сгруппированные строки
+def aggregate(kind, ids, id_discipline, today):
+    model = WORKS[kind][0]
+    counters = defaultdict(lambda: dict(submitted=0, accepted=0, gradeSum=0, graded=0, overdue=0,
+                                        grades=dict.fromkeys(GRADES, 0)))
+    accepted = func.sum(case((model.status == ACCEPTED, 1), else_=0))
+    query = db.session.query(Student.id_group, model.id_discipline, model.grade, func.count(model.id), accepted) \
+        .join(Student, Student.id == model.id_student) \
+        .filter(Student.id_group.in_(ids)) \
+        .group_by(Student.id_group, model.id_discipline, model.grade)
+    if id_discipline is not None:
+        query = query.filter(model.id_discipline == id_discipline)
+    for id_group, discipline, grade, count, accepted_count in query:
+        item = counters[(id_group, discipline)]
+        item["submitted"] += count
+        item["accepted"] += accepted_count or 0
+        if grade is not None:
+            item["graded"] += count
+            item["gradeSum"] += grade * count
+            if grade in item["grades"]:
+                item["grades"][grade] += count
+
+    if kind == "lw":
+        overdue = db.session.query(Student.id_group, WorkGroup.id_discipline, func.count(WorkGroup.id)) \
+            .join(WorkGroup, WorkGroup.id_group == Student.id_group) \
+            .outerjoin(ResultLabWork, and_(ResultLabWork.id_student == Student.id,
+                                           ResultLabWork.id_LaboratoryWork == WorkGroup.id_LaboratoryWork)) \
+            .filter(Student.id_group.in_(ids), WorkGroup.deadline < today, ResultLabWork.id.is_(None)) \
+            .group_by(Student.id_group, WorkGroup.id_discipline)
+        if id_discipline is not None:
+            overdue = overdue.filter(WorkGroup.id_discipline == id_discipline)
+    else:
+        pairs = group_disciplines()
+        overdue = db.session.query(Student.id_group, ControlWork.id_discipline, func.count(ControlWork.id)) \
+            .join(pairs, pairs.c.id_group == Student.id_group) \
+            .join(ControlWork, ControlWork.id_discipline == pairs.c.id_discipline) \
+            .outerjoin(ResultControlWork, and_(ResultControlWork.id_student == Student.id,
+                                               ResultControlWork.id_controlWork == ControlWork.id)) \
+            .filter(Student.id_group.in_(ids), ControlWork.deadline < today, ResultControlWork.id.is_(None)) \
+            .group_by(Student.id_group, ControlWork.id_discipline)
+        if id_discipline is not None:
+            overdue = overdue.filter(ControlWork.id_discipline == id_discipline)
+    for id_group, discipline, count in overdue:
+        counters[(id_group, discipline)]["overdue"] = count
+    return counters
+
+
+# Число заданных работ по (id класса, id дисциплины): ПР — назначения классу, КР — все КР дисциплин,
+# которые ведут преподаватели класса
+def assigned_works(ids, id_discipline):
+    lw = db.session.query(WorkGroup.id_group, WorkGroup.id_discipline, func.count(WorkGroup.id)) \
+        .filter(WorkGroup.id_group.in_(ids)) \
+        .group_by(WorkGroup.id_group, WorkGroup.id_discipline)
+    pairs = group_disciplines()
+    cw = db.session.query(pairs.c.id_group, pairs.c.id_discipline, func.count(ControlWork.id)) \
+        .join(ControlWork, ControlWork.id_discipline == pairs.c.id_discipline) \
+        .filter(pairs.c.id_group.in_(ids)) \
+        .group_by(pairs.c.id_group, pairs.c.id_discipline)
+    if id_discipline is not None:
+        lw = lw.filter(WorkGroup.id_discipline == id_discipline)
+        cw = cw.filter(pairs.c.id_discipline == id_discipline)
+    return {
+        "lw": {(id_group, discipline): count for id_group, discipline, count in lw},
+        "cw": {(id_group, discipline): count for id_group, discipline, count in cw},
+    }
+
+
+# Строки отчёта для части классов: по строке на класс, дисциплину и вид работ
+def report_rows(ids, id_discipline, groups, disciplines, today):
+    students = dict(db.session.query(Student.id_group, func.count(Student.id))
+                    .filter(Student.id_group.in_(ids)).group_by(Student.id_group))
+    assigned = assigned_works(ids, id_discipline)
+    rows = []
+    for kind in WORKS:
+        counters = aggregate(kind, ids, id_discipline, today)
+        keys = set(assigned[kind]) | set(counters)
+        for id_group, discipline in keys:
+            item = counters[(id_group, discipline)]
+            count = students.get(id_group, 0)
+            works = assigned[kind].get((id_group, discipline), 0)
+            expected = count * works
+            rows.append((
+                groups.get(id_group, id_group),
+                disciplines.get(discipline, discipline),
+                kind,
+                count,
+                works,
+                expected,
+                item["submitted"],
+                item["accepted"],
+                round(item["accepted"] / expected, 3) if expected else "",
+                item["overdue"],
+                round(item["gradeSum"] / item["graded"], 2) if item["graded"] else "",
+            ) + tuple(item["grades"][grade] for grade in GRADES))
+    rows.sort(key=lambda row: (str(row[0]), str(row[1]), row[2]))
+    return rows
+
+
+# Отчёт по классам и дисциплинам в файл CSV. Классы обрабатываются частями по chunk_size, после каждой части
+# вызывается progress(доля выполненного), поэтому память не зависит от числа классов, а ход построения виден
+def build(path, id_group=None, id_discipline=None, chunk_size=50, progress=None, today=None):
+    today = today or date.today()
+    groups = dict(db.session.query(Group.id, Group.number))
+    disciplines = dict(db.session.query(Discipline.id, Discipline.name))
+    ids = sorted(groups, key=lambda key: str(groups[key])) if id_group is None else [id_group]
+    chunk_size = max(chunk_size, 1)
+    temporary = path + ".tmp"
+    count = 0
+    with open(temporary, "w", encoding="utf-8-sig", newline="") as file:
+        writer = csv.writer(file, delimiter=";")
+        writer.writerow(HEADER)
+        for done, part in enumerate(chunks(ids, chunk_size), start=1):
+            rows = report_rows(part, id_discipline, groups, disciplines, today)
+            writer.writerows(rows)
+            count += len(rows)
+            if progress is not None:
+                progress(min(done * chunk_size, len(ids)) / len(ids))
+    os.replace(temporary, path)
+    return count
+
+
+# Обработчик очереди отчётов: запускается командой flask report-worker, обработчиков может быть несколько.
+# Задание забирается условным UPDATE (status = 'queued'), поэтому два обработчика не возьмут одно задание.
+# Задание, обработчик которого перестал отмечаться дольше stale секунд, возвращается в очередь
+class ReportWorker:
+    def __init__(self, app=None):
+        self.directory = None
+        self.chunk_size = 50
+        self.interval = 5
+        self.stale = 600
+        self.max_attempts = 3
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.directory = app.config.get("REPORT_DIR") or os.path.join(app.instance_path, "reports")
+        self.chunk_size = int(app.config.get("REPORT_CHUNK_SIZE", self.chunk_size))
+        self.interval = float(app.config.get("REPORT_POLL_INTERVAL", self.interval))
+        self.stale = float(app.config.get("REPORT_STALE_SECONDS", self.stale))
+        self.max_attempts = int(app.config.get("REPORT_MAX_ATTEMPTS", self.max_attempts))
+        app.extensions["report_worker"] = self
+
+    def file_name(self, job):
+        return "report_%d.csv" % job.id
+
+    def requeue_stale(self):
+        deadline = datetime.now() - timedelta(seconds=self.stale)
+        stale = and_(ReportJob.status == RUNNING, ReportJob.dateHeartbeat < deadline)
+        ReportJob.query.filter(stale, ReportJob.attempts >= self.max_attempts) \
+            .update({ReportJob.status: FAILED, ReportJob.lastError: "Обработчик остановился",
+                     ReportJob.dateFinished: datetime.now()}, synchronize_session=False)
+        ReportJob.query.filter(stale).update({ReportJob.status: QUEUED}, synchronize_session=False)
+        db.session.commit()
+
+    def claim(self):
+        while True:
+            id_job = db.session.query(ReportJob.id).filter(ReportJob.status == QUEUED) \
+                .order_by(ReportJob.id).limit(1).scalar()
+            if id_job is None:
+                db.session.commit()
+                return None
+            now = datetime.now()
+            claimed = ReportJob.query.filter(ReportJob.id == id_job, ReportJob.status == QUEUED) \
+                .update({ReportJob.status: RUNNING, ReportJob.progress: 0, ReportJob.attempts: ReportJob.attempts + 1,
+                         ReportJob.dateStarted: now, ReportJob.dateHeartbeat: now}, synchronize_session=False)
+            db.session.commit()
+            if claimed == 1:
+                return ReportJob.query.get(id_job)
+
+    def set_progress(self, id_job, share):
+        ReportJob.query.filter(ReportJob.id == id_job) \
+            .update({ReportJob.progress: int(share * 99), ReportJob.dateHeartbeat: datetime.now()},
+                    synchronize_session=False)
+        db.session.commit()
+
+    def process(self, job):
+        id_job = job.id
+        name = self.file_name(job)
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            rows = build(os.path.join(self.directory, name), job.id_group, job.id_discipline, self.chunk_size,
+                         lambda share: self.set_progress(id_job, share))
+            ReportJob.query.filter(ReportJob.id == id_job) \
+                .update({ReportJob.status: DONE, ReportJob.progress: 100, ReportJob.fileName: name,
+                         ReportJob.lastError: None, ReportJob.dateFinished: datetime.now()},
+                        synchronize_session=False)
+            db.session.commit()
+            logger.info("Отчёт %d построен: строк %d", id_job, rows)
+        except Exception as e:
+            db.session.rollback()
+            logger.exception("Ошибка построения отчёта %d", id_job)
+            ReportJob.query.filter(ReportJob.id == id_job) \
+                .update({ReportJob.status: FAILED, ReportJob.lastError: str(e)[:200],
+                         ReportJob.dateFinished: datetime.now()}, synchronize_session=False)
+            db.session.commit()
+
+    # Выполнение всех заданий из очереди; возвращает число выполненных
+    def run_once(self):
+        self.requeue_stale()
+        done = 0
+        while True:
+            job = self.claim()
+            if job is None:
+                return done
+            self.process(job)
+            done += 1
+
+    def run(self):
+        while True:
+            try:
+                self.run_once()
+            except Exception:
+                db.session.rollback()
+                logger.exception("Ошибка обработки очереди отчётов")
+            time.sleep(self.interval)
+
+    # Путь к готовому файлу отчёта или None
+    def path(self, job):
+        if job.status != DONE or not job.fileName:
+            return None
+        path = os.path.join(self.directory, job.fileName)
+        return path if os.path.exists(path) else None
+
+
+report_worker = ReportWorker()
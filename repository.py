@@ -0,0 +1,240 @@
+from sqlalchemy import and_, func
+from models import db, User, Group, Student, Teacher, TeacherGroup, Discipline, TeacherDiscipline, \
+    LaboratoryWork, WorkGroup, ResultLabWork, ControlWork, ResultControlWork, StudentSummary, GroupSummary, \
+    Notification
+
+
+# Справочники: только столбцы, нужные выпадающим спискам, без ORM-объектов, чтобы их можно было хранить в кеше
+def all_groups():
+    return db.session.query(Group.id, Group.number).order_by(Group.number).all()
+
+
+def all_disciplines():
+    return db.session.query(Discipline.id, Discipline.name).order_by(Discipline.name).all()
+
+
+def all_teachers():
+    return db.session.query(Teacher.id, Teacher.fullName).order_by(Teacher.fullName).all()
+
+
+# Запросы страниц студента: выбираются только строки конкретного студента
+def student_lw_results(student):
+    return db.session.query(ResultLabWork, Discipline, LaboratoryWork, WorkGroup) \
+        .join(LaboratoryWork, ResultLabWork.id_LaboratoryWork == LaboratoryWork.id) \
+        .join(WorkGroup, (WorkGroup.id_LaboratoryWork == LaboratoryWork.id) & (WorkGroup.id_group == student.id_group)) \
+        .join(Discipline, ResultLabWork.id_discipline == Discipline.id) \
+        .filter(ResultLabWork.id_student == student.id).all()
+
+
+def student_cw_results(student):
+    return db.session.query(ResultControlWork, Discipline, ControlWork) \
+        .join(ControlWork, ResultControlWork.id_controlWork == ControlWork.id) \
+        .join(Discipline, ResultControlWork.id_discipline == Discipline.id) \
+        .filter(ResultControlWork.id_student == student.id).all()
+
+
+# Итоги ученика по дисциплинам класса; строки ученика может ещё не быть, если он ничего не сдавал
+def student_summaries(id_student, id_group):
+    return db.session.query(Discipline, GroupSummary, StudentSummary) \
+        .join(Discipline, GroupSummary.id_discipline == Discipline.id) \
+        .outerjoin(StudentSummary, and_(StudentSummary.id_discipline == GroupSummary.id_discipline,
+                                        StudentSummary.id_student == id_student)) \
+        .filter(GroupSummary.id_group == id_group) \
+        .order_by(Discipline.name).all()
+
+
+def student_notifications(id_student, limit=10):
+    return Notification.query.filter_by(id_student=id_student).order_by(Notification.id.desc()).limit(limit).all()
+
+
+# Запросы страниц преподавателя: выбираются только строки преподавателя и класса
+def teacher_groups(id_teacher):
+    return db.session.query(Group.id, Group.number) \
+        .join(TeacherGroup, Group.id == TeacherGroup.id_group) \
+        .filter(TeacherGroup.id_teacher == id_teacher) \
+        .order_by(Group.number).all()
+
+
+def teacher_disciplines(id_teacher):
+    return db.session.query(Discipline.id, Discipline.name) \
+        .join(TeacherDiscipline, Discipline.id == TeacherDiscipline.id_discipline) \
+        .filter(TeacherDiscipline.id_teacher == id_teacher) \
+        .order_by(Discipline.name).all()
+
+
+def teacher_lab_works(id_teacher):
+    return db.session.query(LaboratoryWork, Discipline) \
+        .join(Discipline, LaboratoryWork.id_discipline == Discipline.id) \
+        .join(TeacherDiscipline, Discipline.id == TeacherDiscipline.id_discipline) \
+        .filter(TeacherDiscipline.id_teacher == id_teacher) \
+        .order_by(Discipline.name, LaboratoryWork.number).all()
+
+
+def teacher_control_works(id_teacher):
+    return db.session.query(ControlWork, Discipline) \
+        .join(Discipline, ControlWork.id_discipline == Discipline.id) \
+        .join(TeacherDiscipline, Discipline.id == TeacherDiscipline.id_discipline) \
+        .filter(TeacherDiscipline.id_teacher == id_teacher) \
+        .order_by(Discipline.name, ControlWork.number).all()
+
+
+def group_lab_works(id_teacher, id_group):
+    return db.session.query(LaboratoryWork, WorkGroup, Discipline) \
+        .join(LaboratoryWork, WorkGroup.id_LaboratoryWork == LaboratoryWork.id) \
+        .join(Discipline, WorkGroup.id_discipline == Discipline.id) \
+        .join(TeacherDiscipline, Discipline.id == TeacherDiscipline.id_discipline) \
+        .filter(TeacherDiscipline.id_teacher == id_teacher, WorkGroup.id_group == id_group) \
+        .order_by(Discipline.name, LaboratoryWork.number).all()
+
+
+def group_students(id_group):
+    return Student.query.filter_by(id_group=id_group).order_by(Student.fullName).all()
+
+
+def group_summaries(id_teacher, id_group):
+    return db.session.query(Discipline, GroupSummary) \
+        .join(Discipline, GroupSummary.id_discipline == Discipline.id) \
+        .join(TeacherDiscipline, Discipline.id == TeacherDiscipline.id_discipline) \
+        .filter(TeacherDiscipline.id_teacher == id_teacher, GroupSummary.id_group == id_group) \
+        .order_by(Discipline.name).all()
+
+
+def group_lw_results(id_teacher, id_group, id_LaboratoryWork):
+    return db.session.query(LaboratoryWork, Discipline, Student, ResultLabWork) \
+        .join(LaboratoryWork, ResultLabWork.id_LaboratoryWork == LaboratoryWork.id) \
+        .join(Discipline, ResultLabWork.id_discipline == Discipline.id) \
+        .join(TeacherDiscipline, Discipline.id == TeacherDiscipline.id_discipline) \
+        .join(Student, ResultLabWork.id_student == Student.id) \
+        .filter(TeacherDiscipline.id_teacher == id_teacher, Student.id_group == id_group,
+                ResultLabWork.id_LaboratoryWork == id_LaboratoryWork)
+
+
+def group_cw_results(id_teacher, id_group, id_controlWork):
+    return db.session.query(ControlWork, Discipline, Student, ResultControlWork) \
+        .join(ControlWork, ResultControlWork.id_controlWork == ControlWork.id) \
+        .join(Discipline, ResultControlWork.id_discipline == Discipline.id) \
+        .join(TeacherDiscipline, Discipline.id == TeacherDiscipline.id_discipline) \
+        .join(Student, ResultControlWork.id_student == Student.id) \
+        .filter(TeacherDiscipline.id_teacher == id_teacher, Student.id_group == id_group,
+                ResultControlWork.id_controlWork == id_controlWork)
+
+
+# Оценки класса за одну работу, по одной на ученика: для заполнения формы оценок всего класса
+def group_grades(model, work_column, id_group, id_work):
+    return db.session.query(model) \
+        .join(Student, model.id_student == Student.id) \
+        .filter(Student.id_group == id_group, getattr(model, work_column) == id_work).all()
+
+
+# Запросы списков для постраничного вывода (pagination.paginate): возвращают запрос без сортировки и LIMIT,
+# pattern - строка поиска для LIKE или None.
+# Столбцы сортировки могут быть пустыми (NULL): сравнение по ключу с NULL ложно, и такие строки пропадали бы на
+# границе страниц, поэтому пустые значения заменяются на пустую строку или 0 и в сортировке, и в условии курсора
+def text_key(column):
+    return func.coalesce(column, "")
+
+
+def student_listing(pattern):
+    query = db.session.query(Student, Group, User) \
+        .join(User, Student.id_user == User.id) \
+        .join(Group, Student.id_group == Group.id)
+    if pattern:
+        query = query.filter(Student.fullName.ilike(pattern, escape="\\") | User.login.ilike(pattern, escape="\\")
+                             | Group.number.ilike(pattern, escape="\\"))
+    return query
+
+
+STUDENT_SORTS = {"fullName": text_key(Student.fullName), "id": Student.id, "group": text_key(Group.number),
+                 "login": text_key(User.login)}
+
+
+def teacher_listing(pattern):
+    query = db.session.query(Teacher, User) \
+        .join(User, Teacher.id_user == User.id)
+    if pattern:
+        query = query.filter(Teacher.fullName.ilike(pattern, escape="\\") | User.login.ilike(pattern, escape="\\")
+                             | Teacher.qualification.ilike(pattern, escape="\\"))
+    return query
+
+
+TEACHER_SORTS = {"fullName": text_key(Teacher.fullName), "id": Teacher.id, "login": text_key(User.login)}
+
+
+def group_listing(pattern):
+    query = db.session.query(Group.id, Group.number)
+    if pattern:
+        query = query.filter(Group.number.ilike(pattern, escape="\\"))
+    return query
+
+
+GROUP_SORTS = {"number": text_key(Group.number), "id": Group.id}
+
+
+def discipline_listing(pattern):
+    query = db.session.query(Discipline.id, Discipline.name)
+    if pattern:
+        query = query.filter(Discipline.name.ilike(pattern, escape="\\"))
+    return query
+
+
+DISCIPLINE_SORTS = {"name": text_key(Discipline.name), "id": Discipline.id}
+
+
+def teacher_discipline_listing(pattern):
+    query = db.session.query(Teacher, TeacherDiscipline, Discipline) \
+        .join(Teacher, TeacherDiscipline.id_teacher == Teacher.id) \
+        .join(Discipline, TeacherDiscipline.id_discipline == Discipline.id)
+    if pattern:
+        query = query.filter(Teacher.fullName.ilike(pattern, escape="\\") | Discipline.name.ilike(pattern, escape="\\"))
+    return query
+
+
+TEACHER_DISCIPLINE_SORTS = {"teacher": text_key(Teacher.fullName), "discipline": text_key(Discipline.name),
+                            "id": TeacherDiscipline.id}
+
+
+def teacher_group_listing(pattern):
+    query = db.session.query(Teacher, TeacherGroup, Group) \
+        .join(Teacher, TeacherGroup.id_teacher == Teacher.id) \
+        .join(Group, TeacherGroup.id_group == Group.id)
+    if pattern:
+        query = query.filter(Teacher.fullName.ilike(pattern, escape="\\") | Group.number.ilike(pattern, escape="\\"))
+    return query
+
+
+TEACHER_GROUP_SORTS = {"teacher": text_key(Teacher.fullName), "group": text_key(Group.number), "id": TeacherGroup.id}
+
+RESULT_LW_SORTS = {"fullName": text_key(Student.fullName), "grade": func.coalesce(ResultLabWork.grade, 0),
+                   "status": text_key(ResultLabWork.status)}
+RESULT_CW_SORTS = {"fullName": text_key(Student.fullName), "grade": func.coalesce(ResultControlWork.grade, 0),
+                   "status": text_key(ResultControlWork.status)}
+
+
+# INSERT с ON CONFLICT для текущей СУБД или None, если СУБД его не поддерживает
+def upsert_insert(table):
+    dialect = db.engine.dialect.name
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        return None
+    return insert(table)
+
+
+# Запись оценок: одна команда INSERT ... ON CONFLICT на все строки, повторная оценка заменяет прежнюю
+def save_results(model, work_column, rows):
+    if not rows:
+        return
+    statement = upsert_insert(model.__table__)
+    if statement is None:
+        for row in rows:
+            model.query.filter_by(id_student=row['id_student'], **{work_column: row[work_column]}).delete()
+        db.session.execute(model.__table__.insert(), rows)
+        return
+    statement = statement.values(rows)
+    statement = statement.on_conflict_do_update(
+        index_elements=['id_student', work_column],
+        set_={'status': statement.excluded.status, 'grade': statement.excluded.grade}
+    )
+    db.session.execute(statement)
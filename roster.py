@@ -0,0 +1,183 @@
+import csv
+import io
+import itertools
+from datetime import date, datetime
+from models import db, User, Group, Student, Teacher
+from hashing import hasher
+from cache import reference_cache
+
+BATCH_SIZE = 500
+
+COLUMNS = {
+    "students": ("fullName", "dateBirth", "groupName", "login", "password"),
+    "teachers": ("fullName", "dateBirth", "qualification", "login", "password"),
+}
+ROLES = {
+    "students": "студент",
+    "teachers": "преподаватель",
+}
+
+
+class RowError(ValueError):
+    pass
+
+
+class ImportReport:
+    def __init__(self):
+        self.created = 0
+        self.errors = []
+
+    def error(self, line, login, message):
+        self.errors.append((line, login, message))
+
+
+# Чтение файла построчно: пары (номер строки в файле, словарь значений по названиям столбцов)
+def read_rows(stream, file_name, kind):
+    if file_name.lower().endswith(".xlsx"):
+        header, rows = read_xlsx(stream)
+    else:
+        header, rows = read_csv(stream)
+    missing = [column for column in COLUMNS[kind] if column not in header]
+    if missing:
+        raise RowError("В файле нет столбцов: %s" % ", ".join(missing))
+    return ((line, dict(zip(header, values))) for line, values in enumerate(rows, start=2))
+
+
+def read_csv(stream):
+    text = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+    first_line = text.readline()
+    delimiter = ";" if first_line.count(";") > first_line.count(",") else ","
+    lines = csv.reader(itertools.chain([first_line], text), delimiter=delimiter)
+    header = [column.strip() for column in next(lines, [])]
+    return header, lines
+
+
+def read_xlsx(stream):
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise RowError("Для загрузки файлов XLSX требуется пакет openpyxl")
+    workbook = load_workbook(stream, read_only=True, data_only=True)
+    lines = workbook.active.iter_rows(values_only=True)
+    header = [str(column).strip() if column is not None else "" for column in next(lines, ())]
+    return header, lines
+
+
+def parse_date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    for date_format in ("%Y-%m-%d", "%d.%m.%Y"):
+        try:
+            return datetime.strptime(str(value).strip(), date_format).date()
+        except ValueError:
+            pass
+    raise RowError("Неверная дата рождения: %s" % value)
+
+
+# Проверка одной строки; классы ищутся в заранее загруженном словаре номер -> id
+def parse_row(kind, raw, groups):
+    record = {}
+    for column in COLUMNS[kind]:
+        value = raw.get(column)
+        if value is not None and column != "dateBirth":
+            value = str(value).strip()
+        if value is None or value == "":
+            raise RowError("Не заполнен столбец %s" % column)
+        record[column] = value
+    if len(record["login"]) > 25:
+        raise RowError("Логин длиннее 25 символов")
+    if len(record["fullName"]) > 120:
+        raise RowError("ФИО длиннее 120 символов")
+    record["dateBirth"] = parse_date(record["dateBirth"])
+    if kind == "students":
+        if record["groupName"] not in groups:
+            raise RowError("Класс %s не найден" % record["groupName"])
+        record["id_group"] = groups[record["groupName"]]
+    return record
+
+
+# Добавление пользователей одной командой INSERT; id берутся из RETURNING, а не повторным запросом
+def insert_users(rows):
+    if db.engine.dialect.name == "postgresql":
+        result = db.session.execute(User.__table__.insert().values(rows).returning(User.id, User.login))
+        return {login: id for id, login in result}
+    users = [User(**row) for row in rows]
+    db.session.add_all(users)
+    db.session.flush()
+    return {user.login: user.id for user in users}
+
+
+def save_accounts(kind, records):
+    ids = insert_users([dict(login=r["login"], passwordHash=r["passwordHash"], role=ROLES[kind]) for r in records])
+    profiles = []
+    for record in records:
+        profile = dict(id_user=ids[record["login"]], fullName=record["fullName"], dateBirth=record["dateBirth"])
+        if kind == "students":
+            profile["id_group"] = record["id_group"]
+        else:
+            profile["qualification"] = record["qualification"]
+        profiles.append(profile)
+    model = Student if kind == "students" else Teacher
+    db.session.execute(model.__table__.insert(), profiles)
+
+
+def insert_batch(kind, batch, report):
+    logins = [record["login"] for line, record in batch]
+    existing = {login for login, in db.session.query(User.login).filter(User.login.in_(logins))}
+    fresh = []
+    for line, record in batch:
+        if record["login"] in existing:
+            report.error(line, record["login"], "Пользователь с таким логином уже зарегистрирован")
+        else:
+            fresh.append((line, record))
+    if not fresh:
+        return
+    hashes = hasher.hash_many([record["password"] for line, record in fresh])
+    for (line, record), password_hash in zip(fresh, hashes):
+        record["passwordHash"] = password_hash
+    try:
+        save_accounts(kind, [record for line, record in fresh])
+        db.session.commit()
+        report.created += len(fresh)
+        return
+    except:
+        db.session.rollback()
+    # Пакет не записался целиком: повторяем по одной строке, чтобы найти и отметить ошибочные
+    for line, record in fresh:
+        try:
+            save_accounts(kind, [record])
+            db.session.commit()
+            report.created += 1
+        except:
+            db.session.rollback()
+            report.error(line, record["login"], "Ошибка при добавлении записи в базу данных")
+
+
+# Загрузка списка учеников или преподавателей; ошибочные строки попадают в отчёт и не прерывают загрузку
+def import_users(kind, rows, batch_size=BATCH_SIZE):
+    groups = {}
+    if kind == "students":
+        groups = dict(db.session.query(Group.number, Group.id).all())
+    report = ImportReport()
+    seen = set()
+    batch = []
+    for line, raw in rows:
+        try:
+            record = parse_row(kind, raw, groups)
+            if record["login"] in seen:
+                raise RowError("Логин повторяется в файле")
+            seen.add(record["login"])
+            batch.append((line, record))
+        except RowError as error:
+            report.error(line, raw.get("login"), str(error))
+        if len(batch) >= batch_size:
+            insert_batch(kind, batch, report)
+            batch = []
+    if batch:
+        insert_batch(kind, batch, report)
+    if report.created and kind == "teachers":
+        reference_cache.bump("Teacher")
+    report.errors.sort(key=lambda error: error[0])
+    return report
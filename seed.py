@@ -0,0 +1,127 @@
+import random
+from datetime import date, timedelta
+from models import db, User, Group, Student, Teacher, Administrator, TeacherGroup, Discipline, TeacherDiscipline, \
+    LaboratoryWork, WorkGroup, ResultLabWork, ControlWork, ResultControlWork
+from hashing import hasher
+from cache import reference_cache
+import summary
+
+LETTERS = "АБВГДЕЖЗИКЛМН"
+STATUSES = ("принято", "принято", "принято", "не принято")
+CHUNK = 5000
+
+
+def group_number(i):
+    if i < 11 * len(LETTERS):
+        return "%d%s" % (1 + i // len(LETTERS), LETTERS[i % len(LETTERS)])
+    return "Г%d" % i
+
+
+def insert(model, rows):
+    for start in range(0, len(rows), CHUNK):
+        db.session.execute(model.__table__.insert(), rows[start:start + CHUNK])
+
+
+# id только что вставленных записей в порядке значений уникального столбца key_column
+def ids_of(column, key_column, values):
+    ids = {}
+    for start in range(0, len(values), 500):
+        ids.update(db.session.query(key_column, column).filter(key_column.in_(values[start:start + 500])))
+    return [ids[value] for value in values]
+
+
+def insert_users(role, logins, password_hash):
+    insert(User, [dict(role=role, login=login, passwordHash=password_hash) for login in logins])
+    return ids_of(User.id, User.login, logins)
+
+
+# Синтетическая школа для нагрузочных замеров: классы, ученики, преподаватели, дисциплины, работы и оценки.
+# У всех пользователей один пароль (хеш вычисляется один раз), логины: <prefix>_admin, <prefix>_t<N>, <prefix>_s<N>.
+# Данные вставляются пачками; рассчитан на отдельную пустую БД
+def seed(groups=10, students=25, teachers=10, disciplines=8, lab_works=10, control_works=4, graded=0.8,
+         password="password", prefix="bench", random_seed=1, today=None):
+    if User.query.filter_by(login=prefix + "_admin").first() is not None:
+        raise ValueError("Данные с префиксом %s уже созданы" % prefix)
+    rnd = random.Random(random_seed)
+    today = today or date.today()
+    password_hash = hasher.hash(password)
+
+    admin_id = insert_users("администратор", [prefix + "_admin"], password_hash)[0]
+    insert(Administrator, [dict(fullName="Администратор", id_user=admin_id)])
+
+    numbers = [group_number(i) for i in range(groups)]
+    insert(Group, [dict(number=number) for number in numbers])
+    group_ids = ids_of(Group.id, Group.number, numbers)
+
+    names = ["Дисциплина %d" % (i + 1) for i in range(disciplines)]
+    insert(Discipline, [dict(name=name) for name in names])
+    discipline_ids = ids_of(Discipline.id, Discipline.name, names)
+
+    logins = ["%s_t%d" % (prefix, i + 1) for i in range(teachers)]
+    user_ids = insert_users("преподаватель", logins, password_hash)
+    insert(Teacher, [dict(id_user=id_user, fullName="Преподаватель %d" % (i + 1), qualification="высшая",
+                          dateBirth=date(1970 + i % 25, 1 + i % 12, 1 + i % 28))
+                     for i, id_user in enumerate(user_ids)])
+    teacher_ids = ids_of(Teacher.id, Teacher.id_user, user_ids)
+
+    # Каждую дисциплину ведёт один преподаватель (по кругу), и он же ведёт её во всех классах
+    discipline_teacher = {id_discipline: teacher_ids[i % teachers] for i, id_discipline in enumerate(discipline_ids)}
+    insert(TeacherDiscipline, [dict(id_teacher=id_teacher, id_discipline=id_discipline)
+                               for id_discipline, id_teacher in discipline_teacher.items()])
+    insert(TeacherGroup, [dict(id_teacher=id_teacher, id_group=id_group)
+                          for id_teacher in sorted(set(discipline_teacher.values())) for id_group in group_ids])
+
+    logins = ["%s_s%d" % (prefix, i + 1) for i in range(groups * students)]
+    user_ids = insert_users("студент", logins, password_hash)
+    student_group = [group_ids[i // students] for i in range(len(user_ids))]
+    insert(Student, [dict(id_user=id_user, fullName="Ученик %05d" % (i + 1), id_group=student_group[i],
+                          dateBirth=date(2008 + i % 8, 1 + i % 12, 1 + i % 28))
+                     for i, id_user in enumerate(user_ids)])
+    student_ids = ids_of(Student.id, Student.id_user, user_ids)
+    group_students = {}
+    for id_student, id_group in zip(student_ids, student_group):
+        group_students.setdefault(id_group, []).append(id_student)
+
+    lab_names = ["ПР %d (%s)" % (n + 1, name) for name in names for n in range(lab_works)]
+    insert(LaboratoryWork, [dict(number=i % lab_works + 1, name=name, id_discipline=discipline_ids[i // lab_works])
+                            for i, name in enumerate(lab_names)])
+    lab_ids = ids_of(LaboratoryWork.id, LaboratoryWork.name, lab_names)
+    lab_discipline = {id_work: discipline_ids[i // lab_works] for i, id_work in enumerate(lab_ids)}
+
+    control_names = ["КР %d (%s)" % (n + 1, name) for name in names for n in range(control_works)]
+    insert(ControlWork, [dict(number=i % control_works + 1, name=name, id_discipline=discipline_ids[i // control_works],
+                              deadline=today + timedelta(days=rnd.randint(-90, 30)))
+                         for i, name in enumerate(control_names)])
+    control_ids = ids_of(ControlWork.id, ControlWork.name, control_names)
+    control_discipline = {id_work: discipline_ids[i // control_works] for i, id_work in enumerate(control_ids)}
+
+    assignments = []
+    lab_results = []
+    for id_group in group_ids:
+        for id_work, id_discipline in lab_discipline.items():
+            assignments.append(dict(deadline=today + timedelta(days=rnd.randint(-90, 30)), id_LaboratoryWork=id_work,
+                                    id_discipline=id_discipline, id_group=id_group))
+            for id_student in group_students[id_group]:
+                if rnd.random() < graded:
+                    lab_results.append(dict(status=rnd.choice(STATUSES), grade=rnd.randint(2, 5),
+                                            id_LaboratoryWork=id_work, id_discipline=id_discipline,
+                                            id_student=id_student))
+    insert(WorkGroup, assignments)
+    insert(ResultLabWork, lab_results)
+
+    control_results = []
+    for id_student in student_ids:
+        for id_work, id_discipline in control_discipline.items():
+            if rnd.random() < graded:
+                control_results.append(dict(status=rnd.choice(STATUSES), grade=rnd.randint(2, 5),
+                                            id_controlWork=id_work, id_discipline=id_discipline,
+                                            id_student=id_student))
+    insert(ResultControlWork, control_results)
+
+    summary.rebuild(today)
+    db.session.commit()
+    reference_cache.bump("Group", "Discipline", "Teacher", "TeacherGroup", "TeacherDiscipline", "LaboratoryWork",
+                          "ControlWork", "WorkGroup")
+    return dict(groups=len(group_ids), students=len(student_ids), teachers=len(teacher_ids),
+                disciplines=len(discipline_ids), lab_works=len(lab_ids), control_works=len(control_ids),
+                assignments=len(assignments), results_lw=len(lab_results), results_cw=len(control_results))
@@ -0,0 +1,189 @@
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from models import db, Student, Group, StudentSnapshot
+from cache import reference_cache
+import repository
+
+logger = logging.getLogger(__name__)
+
+
+# Счётчик поколений ученика в кеше справочников: увеличивается после записи его оценок
+def generation_key(id_student):
+    return "StudentSnapshot:%d" % id_student
+
+
+# Данные профиля ученика: сведения об ученике и его оценки за проверочные и контрольные работы
+def build(id_student):
+    row = db.session.query(Student, Group).join(Group, Student.id_group == Group.id) \
+        .filter(Student.id == id_student).first()
+    if row is None:
+        return None
+    student = row.Student
+    lab_works = [dict(
+        discipline=r.Discipline.name,
+        number=r.LaboratoryWork.number,
+        name=r.LaboratoryWork.name,
+        deadline=r.WorkGroup.deadline.isoformat() if r.WorkGroup.deadline else None,
+        status=r.ResultLabWork.status,
+        grade=r.ResultLabWork.grade,
+    ) for r in repository.student_lw_results(student)]
+    control_works = [dict(
+        discipline=r.Discipline.name,
+        number=r.ControlWork.number,
+        name=r.ControlWork.name,
+        deadline=r.ControlWork.deadline.isoformat() if r.ControlWork.deadline else None,
+        status=r.ResultControlWork.status,
+        grade=r.ResultControlWork.grade,
+    ) for r in repository.student_cw_results(student)]
+    return dict(
+        student=dict(id=student.id, fullName=student.fullName, id_group=student.id_group, group=row.Group.number,
+                     dateBirth=student.dateBirth.isoformat() if student.dateBirth else None),
+        lab_works=lab_works,
+        control_works=control_works,
+    )
+
+
+def now():
+    return datetime.utcnow().replace(microsecond=0)
+
+
+# Отметка об изменении оценок учеников (в транзакции записи оценок): версия увеличивается, данные собираются заново
+# при следующем обращении. Строка создаётся, даже если данных ещё нет, чтобы одновременная сборка по прежним оценкам
+# не записала устаревшие данные
+def invalidate(ids):
+    ids = sorted(set(ids))
+    if not ids:
+        return
+    rows = [dict(id_student=id_student, version=1, dateModified=now(), data=None) for id_student in ids]
+    table = StudentSnapshot.__table__
+    statement = repository.upsert_insert(table)
+    if statement is None:
+        for row in rows:
+            snapshot = StudentSnapshot.query.get(row["id_student"])
+            if snapshot is None:
+                db.session.add(StudentSnapshot(**row))
+            else:
+                snapshot.version += 1
+                snapshot.dateModified = row["dateModified"]
+                snapshot.data = None
+        return
+    statement = statement.values(rows)
+    statement = statement.on_conflict_do_update(
+        index_elements=["id_student"],
+        set_={"version": table.c.version + 1, "dateModified": statement.excluded.dateModified, "data": None}
+    )
+    db.session.execute(statement)
+
+
+# Сохранение собранных данных. Запись выполняется, только если версия не изменилась с момента чтения
+def store(id_student, version, data):
+    if version is None:
+        statement = repository.upsert_insert(StudentSnapshot.__table__)
+        row = dict(id_student=id_student, version=1, dateModified=now(), data=data)
+        if statement is None:
+            if StudentSnapshot.query.get(id_student) is not None:
+                return None
+            db.session.add(StudentSnapshot(**row))
+        else:
+            result = db.session.execute(statement.values(row).on_conflict_do_nothing(index_elements=["id_student"]))
+            if result.rowcount != 1:
+                return None
+        return 1, row["dateModified"]
+    result = db.session.execute(
+        StudentSnapshot.__table__.update()
+        .where(StudentSnapshot.id_student == id_student, StudentSnapshot.version == version,
+               StudentSnapshot.data.is_(None))
+        .values(data=data)
+    )
+    return (version, None) if result.rowcount == 1 else None
+
+
+# Кеш версий данных профиля: позволяет ответить 304 на повторный запрос, не обращаясь к БД. Версия действительна,
+# пока не изменилось поколение ученика (generation_key), но не дольше ttl секунд: с LocalBackend поколения не общие
+# для процессов, и процесс, не видевший записи оценок, иначе отвечал бы 304 со старой версией бесконечно
+class SnapshotCache:
+    def __init__(self, app=None):
+        self.maxsize = 10000
+        self.ttl = 60
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.maxsize = int(app.config.get("SNAPSHOT_CACHE_SIZE", self.maxsize))
+        self.ttl = float(app.config.get("SNAPSHOT_CACHE_TTL", self.ttl))
+        app.extensions["snapshot_cache"] = self
+
+    # Версия и время изменения (version, dateModified) или None, если их нужно прочитать из БД
+    def version(self, id_student):
+        generation = reference_cache.generation((generation_key(id_student),))
+        with self.lock:
+            entry = self.entries.get(id_student)
+            if entry is not None and entry[0] == generation and entry[2] > time.monotonic():
+                self.entries.move_to_end(id_student)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+        return None
+
+    def remember(self, id_student, generation, version):
+        if self.maxsize <= 0 or self.ttl <= 0:
+            return
+        with self.lock:
+            self.entries[id_student] = (generation, version, time.monotonic() + self.ttl)
+            self.entries.move_to_end(id_student)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+    # Данные профиля (version, dateModified, JSON) из одной строки StudentSnapshot; если данных нет или они
+    # устарели, они собираются и сохраняются. Строка читается с основной БД: версия с отстающей реплики была бы
+    # запомнена под поколением, которое уже увеличила запись оценок
+    def load(self, id_student):
+        with db.primary():
+            return self.load_primary(id_student)
+
+    def load_primary(self, id_student):
+        generation = reference_cache.generation((generation_key(id_student),))
+        snapshot = StudentSnapshot.query.get(id_student)
+        if snapshot is not None and snapshot.data is not None:
+            self.remember(id_student, generation, (snapshot.version, snapshot.dateModified))
+            return snapshot.version, snapshot.dateModified, snapshot.data
+        data = build(id_student)
+        if data is None:
+            return None
+        data = json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+        version = snapshot.version if snapshot is not None else None
+        modified = snapshot.dateModified if snapshot is not None else None
+        try:
+            stored = store(id_student, version, data)
+            db.session.commit()
+        except Exception:
+            # Например, запрос выполняется на реплике только для чтения: данные отдаются без сохранения
+            db.session.rollback()
+            logger.warning("Не удалось сохранить данные профиля ученика %d", id_student, exc_info=True)
+            stored = None
+        if stored is None:
+            # Оценки изменились во время сборки или данные не сохранены: ответ отдаётся без версии
+            return None, None, data
+        version = stored[0]
+        modified = stored[1] or modified
+        self.remember(id_student, generation, (version, modified))
+        return version, modified, data
+
+    # Вызывается после фиксации транзакции, в которой вызван invalidate
+    def bump(self, ids):
+        reference_cache.bump(*[generation_key(id_student) for id_student in set(ids)])
+
+    def stats(self):
+        with self.lock:
+            return dict(size=len(self.entries), maxsize=self.maxsize, hits=self.hits, misses=self.misses)
+
+
+snapshot_cache = SnapshotCache()
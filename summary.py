@@ -0,0 +1,237 @@
+from collections import defaultdict
+from datetime import date
+from sqlalchemy import and_, case, func
+from models import db, Student, TeacherGroup, TeacherDiscipline, WorkGroup, ResultLabWork, ControlWork, \
+    ResultControlWork, StudentSummary, GroupSummary
+import repository
+
+ACCEPTED = "принято"
+COUNTERS = ("lwSubmitted", "lwAccepted", "lwGradeSum", "lwOverdue",
+            "cwSubmitted", "cwAccepted", "cwGradeSum", "cwOverdue")
+GROUP_COUNTERS = ("lwAssigned", "cwAssigned") + COUNTERS
+WORKS = {
+    "lw": (ResultLabWork, "id_LaboratoryWork"),
+    "cw": (ResultControlWork, "id_controlWork"),
+}
+KEYS = {
+    StudentSummary: ("id_student", "id_discipline"),
+    GroupSummary: ("id_group", "id_discipline"),
+}
+
+
+# Прибавление значений к счётчикам итогов; строки, которых ещё нет, создаются (INSERT ... ON CONFLICT DO UPDATE)
+def add_counters(model, rows):
+    if not rows:
+        return
+    keys = KEYS[model]
+    counters = [column for column in rows[0] if column in GROUP_COUNTERS]
+    table = model.__table__
+    statement = repository.upsert_insert(table)
+    if statement is None:
+        for row in rows:
+            item = model.query.get(tuple(row[key] for key in keys))
+            if item is None:
+                item = model(**row)
+                db.session.add(item)
+            else:
+                for column in counters:
+                    setattr(item, column, getattr(item, column) + row[column])
+        return
+    statement = statement.values(rows)
+    statement = statement.on_conflict_do_update(
+        index_elements=list(keys),
+        set_={column: table.c[column] + getattr(statement.excluded, column) for column in counters}
+    )
+    db.session.execute(statement)
+
+
+def work_overdue(kind, id_work, id_group, today):
+    if kind == "lw":
+        deadline = db.session.query(WorkGroup.deadline) \
+            .filter(WorkGroup.id_group == id_group, WorkGroup.id_LaboratoryWork == id_work).scalar()
+    else:
+        deadline = db.session.query(ControlWork.deadline).filter(ControlWork.id == id_work).scalar()
+    return deadline is not None and deadline < today
+
+
+# Блокировка строки итогов класса по дисциплине до конца транзакции (строка создаётся, если её ещё нет).
+# Одновременные записи оценок класса (например, двойное нажатие «Сохранить») выполняются по очереди, и каждая
+# читает прежние оценки уже после фиксации предыдущей
+def lock_group(id_group, id_discipline):
+    add_counters(GroupSummary, [dict(id_group=id_group, id_discipline=id_discipline,
+                                     **dict.fromkeys(GROUP_COUNTERS, 0))])
+    db.session.query(GroupSummary.id_group) \
+        .filter(GroupSummary.id_group == id_group, GroupSummary.id_discipline == id_discipline) \
+        .with_for_update().one()
+
+
+# Учёт оценок за одну работу до их записи (в той же транзакции): сравниваются новые и прежние оценки,
+# к итогам ученика и класса прибавляется только разница. Возвращает прежние оценки по id ученика
+def record_results(kind, id_work, id_discipline, id_group, rows, today=None):
+    if not rows:
+        return {}
+    lock_group(id_group, id_discipline)
+    model, work_column = WORKS[kind]
+    ids = [row["id_student"] for row in rows]
+    previous = {r.id_student: r for r in db.session.query(model.id_student, model.status, model.grade)
+                .filter(model.id_student.in_(ids), getattr(model, work_column) == id_work)}
+    # Сдача просроченной работы: число просроченных работ учеников пересчитывается без неё. Просто вычесть единицу
+    # нельзя — срок мог пройти после последнего пересчёта итогов, и тогда эта работа ещё не учтена как просроченная
+    stored = actual = {}
+    today = today or date.today()
+    recount = work_overdue(kind, id_work, id_group, today)
+    if recount:
+        stored = dict(db.session.query(StudentSummary.id_student, getattr(StudentSummary, kind + "Overdue"))
+                      .filter(StudentSummary.id_student.in_(ids), StudentSummary.id_discipline == id_discipline))
+        actual = {id_student: count for id_student, _, count
+                  in overdue_counts(kind, today, ids, id_discipline, exclude=id_work)}
+    totals = dict.fromkeys(COUNTERS, 0)
+    student_rows = []
+    for row in rows:
+        delta = dict.fromkeys(COUNTERS, 0)
+        old = previous.get(row["id_student"])
+        if old is None:
+            delta[kind + "Submitted"] = 1
+            delta[kind + "Accepted"] = int(row["status"] == ACCEPTED)
+            delta[kind + "GradeSum"] = row["grade"] or 0
+        else:
+            delta[kind + "Accepted"] = int(row["status"] == ACCEPTED) - int(old.status == ACCEPTED)
+            delta[kind + "GradeSum"] = (row["grade"] or 0) - (old.grade or 0)
+        if recount:
+            delta[kind + "Overdue"] = actual.get(row["id_student"], 0) - stored.get(row["id_student"], 0)
+        for column in COUNTERS:
+            totals[column] += delta[column]
+        student_rows.append(dict(id_student=row["id_student"], id_discipline=id_discipline, id_group=id_group, **delta))
+    add_counters(StudentSummary, student_rows)
+    add_counters(GroupSummary, [dict(id_group=id_group, id_discipline=id_discipline, lwAssigned=0, cwAssigned=0,
+                                     **totals)])
+    return previous
+
+
+# Работа, срок сдачи которой уже прошёл: она просрочена у всех учеников классов, пока они её не сдали
+def record_overdue(kind, id_groups, id_discipline):
+    column = kind + "Overdue"
+    student_rows = []
+    totals = defaultdict(int)
+    for id_student, id_group in db.session.query(Student.id, Student.id_group).filter(Student.id_group.in_(id_groups)):
+        row = dict(id_student=id_student, id_discipline=id_discipline, id_group=id_group, **dict.fromkeys(COUNTERS, 0))
+        row[column] = 1
+        student_rows.append(row)
+        totals[id_group] += 1
+    group_rows = []
+    for id_group, count in totals.items():
+        row = dict(id_group=id_group, id_discipline=id_discipline, **dict.fromkeys(GROUP_COUNTERS, 0))
+        row[column] = count
+        group_rows.append(row)
+    add_counters(StudentSummary, student_rows)
+    add_counters(GroupSummary, group_rows)
+
+
+# Новая ПР для класса
+def record_assignment(id_group, id_discipline, deadline=None, today=None):
+    row = dict(id_group=id_group, id_discipline=id_discipline, **dict.fromkeys(GROUP_COUNTERS, 0))
+    row["lwAssigned"] = 1
+    add_counters(GroupSummary, [row])
+    if deadline is not None and deadline < (today or date.today()):
+        record_overdue("lw", [id_group], id_discipline)
+
+
+# Новая КР дисциплины: задаётся всем классам, которые ведут преподаватели этой дисциплины. Строки итогов
+# создаются для классов, у которых их ещё нет
+def record_control_work(id_discipline, deadline=None, today=None):
+    pairs = group_disciplines()
+    id_groups = [id_group for (id_group,) in db.session.query(pairs.c.id_group)
+                 .filter(pairs.c.id_discipline == id_discipline)]
+    rows = []
+    for id_group in id_groups:
+        row = dict(id_group=id_group, id_discipline=id_discipline, **dict.fromkeys(GROUP_COUNTERS, 0))
+        row["cwAssigned"] = 1
+        rows.append(row)
+    add_counters(GroupSummary, rows)
+    if id_groups and deadline is not None and deadline < (today or date.today()):
+        record_overdue("cw", id_groups, id_discipline)
+
+
+# Классы и дисциплины, связанные через преподавателя: так КР попадают на страницы классов
+def group_disciplines():
+    return db.session.query(TeacherGroup.id_group, TeacherDiscipline.id_discipline) \
+        .join(TeacherDiscipline, TeacherDiscipline.id_teacher == TeacherGroup.id_teacher) \
+        .distinct().subquery()
+
+
+# Число просроченных и не сданных работ по ученикам и дисциплинам: (id ученика, id дисциплины, число).
+# students, id_discipline и exclude (работа, которая сдаётся сейчас) ограничивают подсчёт
+def overdue_counts(kind, today, students=None, id_discipline=None, exclude=None):
+    if kind == "lw":
+        work, discipline = WorkGroup.id_LaboratoryWork, WorkGroup.id_discipline
+        query = db.session.query(Student.id, discipline, func.count(WorkGroup.id)) \
+            .join(WorkGroup, WorkGroup.id_group == Student.id_group) \
+            .outerjoin(ResultLabWork, and_(ResultLabWork.id_student == Student.id,
+                                           ResultLabWork.id_LaboratoryWork == WorkGroup.id_LaboratoryWork)) \
+            .filter(WorkGroup.deadline < today, ResultLabWork.id.is_(None))
+    else:
+        pairs = group_disciplines()
+        work, discipline = ControlWork.id, ControlWork.id_discipline
+        query = db.session.query(Student.id, discipline, func.count(ControlWork.id)) \
+            .join(pairs, pairs.c.id_group == Student.id_group) \
+            .join(ControlWork, ControlWork.id_discipline == pairs.c.id_discipline) \
+            .outerjoin(ResultControlWork, and_(ResultControlWork.id_student == Student.id,
+                                               ResultControlWork.id_controlWork == ControlWork.id)) \
+            .filter(ControlWork.deadline < today, ResultControlWork.id.is_(None))
+    if students is not None:
+        query = query.filter(Student.id.in_(students))
+    if id_discipline is not None:
+        query = query.filter(discipline == id_discipline)
+    if exclude is not None:
+        query = query.filter(work != exclude)
+    return query.group_by(Student.id, discipline)
+
+
+# Полный пересчёт итогов агрегирующими запросами. Нужен после изменения связей преподавателей с классами
+# и дисциплинами, а также раз в сутки, чтобы учесть работы, срок сдачи которых прошёл
+def rebuild(today=None):
+    today = today or date.today()
+    students = defaultdict(lambda: dict.fromkeys(COUNTERS, 0))
+    groups = defaultdict(lambda: dict.fromkeys(GROUP_COUNTERS, 0))
+    for kind, (model, work_column) in WORKS.items():
+        accepted = func.sum(case((model.status == ACCEPTED, 1), else_=0))
+        query = db.session.query(model.id_student, model.id_discipline, func.count(model.id), accepted,
+                                 func.sum(func.coalesce(model.grade, 0))) \
+            .group_by(model.id_student, model.id_discipline)
+        for id_student, id_discipline, submitted, accepted_count, grade_sum in query:
+            counters = students[(id_student, id_discipline)]
+            counters[kind + "Submitted"] = submitted
+            counters[kind + "Accepted"] = accepted_count or 0
+            counters[kind + "GradeSum"] = grade_sum or 0
+
+    for kind in WORKS:
+        for id_student, id_discipline, count in overdue_counts(kind, today):
+            students[(id_student, id_discipline)][kind + "Overdue"] = count
+
+    pairs = group_disciplines()
+    lw_assigned = db.session.query(WorkGroup.id_group, WorkGroup.id_discipline, func.count(WorkGroup.id)) \
+        .group_by(WorkGroup.id_group, WorkGroup.id_discipline)
+    for id_group, id_discipline, count in lw_assigned:
+        groups[(id_group, id_discipline)]["lwAssigned"] = count
+    cw_count = dict(db.session.query(ControlWork.id_discipline, func.count(ControlWork.id))
+                    .group_by(ControlWork.id_discipline))
+    for id_group, id_discipline in db.session.query(pairs):
+        groups[(id_group, id_discipline)]["cwAssigned"] = cw_count.get(id_discipline, 0)
+
+    student_group = dict(db.session.query(Student.id, Student.id_group))
+    student_rows = []
+    for (id_student, id_discipline), counters in students.items():
+        id_group = student_group.get(id_student)
+        student_rows.append(dict(id_student=id_student, id_discipline=id_discipline, id_group=id_group, **counters))
+        if id_group is not None:
+            for column in COUNTERS:
+                groups[(id_group, id_discipline)][column] += counters[column]
+    group_rows = [dict(id_group=id_group, id_discipline=id_discipline, **counters)
+                  for (id_group, id_discipline), counters in groups.items() if id_group is not None]
+
+    StudentSummary.query.delete()
+    GroupSummary.query.delete()
+    for model, rows in ((StudentSummary, student_rows), (GroupSummary, group_rows)):
+        for start in range(0, len(rows), 1000):
+            db.session.execute(model.__table__.insert(), rows[start:start + 1000])
+    return len(student_rows), len(group_rows)
@@ -0,0 +1,27 @@
+import os
+import sys
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app
+from models import db
+from cache import reference_cache
+from identity import identity_cache
+from snapshots import snapshot_cache
+
+
+# Приложение с пустой временной БД. Кеши — общие объекты модуля, а счётчики поколений создаются заново для каждого
+# приложения, поэтому записи, оставшиеся от приложения предыдущего теста, сбрасываются
+@pytest.fixture
+def app(tmp_path):
+    app = create_app(dict(SQLALCHEMY_DATABASE_URI="sqlite:///%s" % (tmp_path / "school.sqlite"), SECRET_KEY="test",
+                          TEMPLATE_PRECOMPILE=False, HASH_METHOD="pbkdf2:sha256:1000", HASH_WORKERS=0,
+                          AUDIT_SYNC=True))
+    reference_cache.entries.clear()
+    identity_cache.clear()
+    snapshot_cache.entries.clear()
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
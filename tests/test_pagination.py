@@ -0,0 +1,109 @@
+import pytest
+from models import db, User, Group, Student, Teacher, Discipline, TeacherDiscipline, LaboratoryWork, ResultLabWork
+from pagination import paginate, encode_cursor
+import repository
+
+PER_PAGE = 4
+
+
+# Класс из 15 учеников с оценками за одну работу; у части учеников нет ФИО, у части результатов — оценки или статуса,
+# оценки повторяются, поэтому на границах страниц встречаются одинаковые ключи сортировки
+def school():
+    group = Group(number="10A")
+    discipline = Discipline(name="Math")
+    teacher = Teacher(fullName="Teacher")
+    db.session.add_all([group, discipline, teacher])
+    db.session.flush()
+    work = LaboratoryWork(number=1, name="LW 1", id_discipline=discipline.id)
+    db.session.add_all([work, TeacherDiscipline(id_teacher=teacher.id, id_discipline=discipline.id)])
+    db.session.flush()
+    for i in range(15):
+        user = User(role="студент", login="s%02d" % i if i % 5 else None, passwordHash="-")
+        db.session.add(user)
+        db.session.flush()
+        student = Student(fullName="Student %d" % (i % 4) if i % 3 else None, id_user=user.id, id_group=group.id)
+        db.session.add(student)
+        db.session.flush()
+        db.session.add(ResultLabWork(status=None if i % 4 == 0 else ("принято", "не принято")[i % 2],
+                                     grade=None if i % 6 == 0 else i % 3 + 3, id_LaboratoryWork=work.id,
+                                     id_discipline=discipline.id, id_student=student.id))
+    db.session.commit()
+    return teacher.id, group.id, work.id
+
+
+def page(app, listing, sorts, default_sort, id_column, **args):
+    with app.test_request_context(query_string=dict(per_page=PER_PAGE, **args)):
+        return paginate(listing(), sorts, default_sort, id_column)
+
+
+# Все строки списка вперёд по next_cursor и обратно от последней страницы по prev_cursor. Если курсор
+# не продвигается, страниц оказывается больше, чем строк, и обход прерывается
+def walk(app, listing, sorts, default_sort, id_column, limit=20, **args):
+    forward = []
+    cursor = None
+    for _ in range(limit):
+        current = page(app, listing, sorts, default_sort, id_column, after=cursor, **args)
+        forward.extend(row.sort_id for row in current)
+        if current.next_cursor is None:
+            break
+        cursor = current.next_cursor
+    backward = [row.sort_id for row in current]
+    cursor = current.prev_cursor
+    for _ in range(limit):
+        if cursor is None:
+            break
+        current = page(app, listing, sorts, default_sort, id_column, before=cursor, **args)
+        backward[:0] = [row.sort_id for row in current]
+        cursor = current.prev_cursor
+    return forward, backward
+
+
+def expected(listing, sorts, sort, order, id_column):
+    rows = listing().add_columns(sorts[sort].label("sort_key"), id_column.label("sort_id")).all()
+    keys = sorted((row.sort_key, row.sort_id) for row in rows)
+    if order == "desc":
+        keys.reverse()
+    return [id_row for key, id_row in keys]
+
+
+@pytest.mark.parametrize("order", ("asc", "desc"))
+@pytest.mark.parametrize("sort", sorted(repository.RESULT_LW_SORTS))
+def test_results_walk_without_gaps(app, sort, order):
+    id_teacher, id_group, id_work = school()
+
+    def listing():
+        return repository.group_lw_results(id_teacher, id_group, id_work)
+
+    forward, backward = walk(app, listing, repository.RESULT_LW_SORTS, "fullName", ResultLabWork.id,
+                             sort=sort, order=order)
+    assert len(forward) == 15
+    assert forward == expected(listing, repository.RESULT_LW_SORTS, sort, order, ResultLabWork.id)
+    assert backward == forward
+
+
+@pytest.mark.parametrize("sort", sorted(repository.STUDENT_SORTS))
+def test_students_walk_without_gaps(app, sort):
+    school()
+
+    def listing():
+        return repository.student_listing(None)
+
+    forward, backward = walk(app, listing, repository.STUDENT_SORTS, "fullName", Student.id, sort=sort)
+    assert forward == expected(listing, repository.STUDENT_SORTS, sort, "asc", Student.id)
+    assert len(forward) == 15
+    assert backward == forward
+
+
+# Испорченный курсор или курсор, не подходящий к столбцу сортировки, открывает первую страницу
+@pytest.mark.parametrize("cursor", ("garbage", encode_cursor(["x", 1]), encode_cursor([4, "1"]),
+                                    encode_cursor([4]), encode_cursor([True, 1]), encode_cursor({"a": 1})))
+def test_tampered_cursor_falls_back_to_first_page(app, cursor):
+    id_teacher, id_group, id_work = school()
+
+    def results(**args):
+        current = page(app, lambda: repository.group_lw_results(id_teacher, id_group, id_work),
+                       repository.RESULT_LW_SORTS, "fullName", ResultLabWork.id, sort="grade", **args)
+        return [row.sort_id for row in current]
+
+    assert results(after=cursor) == results()
+    assert results(before=cursor) == results()
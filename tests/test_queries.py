@@ -0,0 +1,140 @@
+import os
+import sys
+import pytest
+from sqlalchemy import event
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app
+from models import db, Group, Student, Discipline, LaboratoryWork, WorkGroup, ResultLabWork, ControlWork, \
+    ResultControlWork
+from cache import reference_cache
+from fragments import FRAGMENTS
+import benchmark
+import seed
+
+# Число SQL-команд и строк, полученных из БД, на основных страницах преподавателя на школе из seed.seed. После
+# добавления классов, учеников и оценок, не связанных с преподавателем, показатели не должны измениться, то есть
+# не зависят от размера БД
+PAGES = ("profile_teacher", "group", "add_lw", "add_cw", "result_lw", "result_cw")
+# Наибольшее число SQL-команд при построении страницы без кешей; с кешами их меньше
+MAX_STATEMENTS = {
+    "profile_teacher": 3,
+    "group": 4,
+    "add_lw": 2,
+    "add_cw": 2,
+    "result_lw": 3,
+    "result_cw": 3,
+}
+# Страницы выводят не больше PER_PAGE строк списка и строки справочников преподавателя
+MAX_ROWS = 200
+
+
+class QueryCounter:
+    def __init__(self):
+        self.statements = 0
+        self.rows = 0
+
+    def reset(self):
+        self.statements = 0
+        self.rows = 0
+
+    def after_cursor_execute(self, *args):
+        self.statements += 1
+
+    # Строки, прочитанные из курсора SQLite: row_factory вызывается для каждой строки
+    def connect(self, connection, record):
+        connection.row_factory = self.row
+
+    def row(self, cursor, row):
+        self.rows += 1
+        return row
+
+
+@pytest.fixture(scope="module")
+def school(tmp_path_factory):
+    path = tmp_path_factory.mktemp("db") / "school.sqlite"
+    app = create_app(dict(SQLALCHEMY_DATABASE_URI="sqlite:///%s" % path, SECRET_KEY="test", TEMPLATE_PRECOMPILE=False,
+                          HASH_METHOD="pbkdf2:sha256:1000"))
+    with app.app_context():
+        db.create_all()
+        seed.seed(groups=6, students=30, teachers=3, disciplines=6, lab_works=8, control_works=4, password="p",
+                  prefix="small")
+        urls = {name: url for name, user, url in benchmark.targets("small") if user == "t1"}
+        engine = db.engine
+    urls["add_lw"] = "/add_lw"
+    urls["add_cw"] = "/add_cw"
+    client = app.test_client()
+    response = client.post("/login", data={"login": "small_t1", "password": "p"})
+    assert response.status_code == 302
+    counter = QueryCounter()
+    event.listen(engine, "after_cursor_execute", counter.after_cursor_execute)
+    event.listen(engine, "connect", counter.connect)
+    engine.dispose()
+    yield app, client, urls, counter
+    event.remove(engine, "connect", counter.connect)
+    event.remove(engine, "after_cursor_execute", counter.after_cursor_execute)
+
+
+# Ещё groups классов по students учеников с оценками по отдельной дисциплине
+def grow(groups=30, students=30):
+    seed.insert(Discipline, [dict(name="Доп. дисциплина")])
+    id_discipline = db.session.query(Discipline.id).filter(Discipline.name == "Доп. дисциплина").scalar()
+    seed.insert(LaboratoryWork, [dict(number=1, name="Доп. ПР", id_discipline=id_discipline)])
+    seed.insert(ControlWork, [dict(number=1, name="Доп. КР", id_discipline=id_discipline)])
+    id_lab = db.session.query(LaboratoryWork.id).filter(LaboratoryWork.name == "Доп. ПР").scalar()
+    id_control = db.session.query(ControlWork.id).filter(ControlWork.name == "Доп. КР").scalar()
+    numbers = ["Доп%d" % i for i in range(groups)]
+    seed.insert(Group, [dict(number=number) for number in numbers])
+    group_ids = seed.ids_of(Group.id, Group.number, numbers)
+    seed.insert(WorkGroup, [dict(id_LaboratoryWork=id_lab, id_discipline=id_discipline, id_group=id_group)
+                            for id_group in group_ids])
+    logins = ["grow_s%d" % i for i in range(groups * students)]
+    user_ids = seed.insert_users("студент", logins, "-")
+    seed.insert(Student, [dict(id_user=id_user, fullName="Доп. ученик %d" % i, id_group=group_ids[i // students])
+                          for i, id_user in enumerate(user_ids)])
+    student_ids = seed.ids_of(Student.id, Student.id_user, user_ids)
+    seed.insert(ResultLabWork, [dict(status="принято", grade=5, id_LaboratoryWork=id_lab, id_discipline=id_discipline,
+                                     id_student=id_student) for id_student in student_ids])
+    seed.insert(ResultControlWork, [dict(status="принято", grade=4, id_controlWork=id_control,
+                                         id_discipline=id_discipline, id_student=id_student)
+                                    for id_student in student_ids])
+    db.session.commit()
+
+
+# Все таблицы справочников и фрагментов: после bump страница строится без кешей
+TABLES = sorted({"Group", "Discipline", "Teacher"}.union(*FRAGMENTS.values()))
+
+
+# Показатели повторного открытия страницы; cold — со сброшенными кешами справочников и фрагментов
+def measure(client, counter, url, cold=False):
+    client.get(url)
+    if cold:
+        reference_cache.bump(*TABLES)
+    counter.reset()
+    response = client.get(url)
+    assert response.status_code == 200, url
+    return counter.statements, counter.rows
+
+
+def test_teacher_has_pages(school):
+    app, client, urls, counter = school
+    assert set(PAGES) <= set(urls)
+
+
+@pytest.mark.parametrize("cold", (False, True))
+@pytest.mark.parametrize("name", PAGES)
+def test_statement_and_row_counts(school, name, cold):
+    app, client, urls, counter = school
+    statements, rows = measure(client, counter, urls[name], cold)
+    assert statements <= MAX_STATEMENTS[name], (name, statements)
+    assert rows <= MAX_ROWS, (name, rows)
+
+
+def test_counts_do_not_grow_with_school(school):
+    app, client, urls, counter = school
+    before = {name: measure(client, counter, urls[name], cold=True) for name in PAGES}
+    with app.app_context():
+        grow()
+    after = {name: measure(client, counter, urls[name], cold=True) for name in PAGES}
+    assert after == before
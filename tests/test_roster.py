@@ -0,0 +1,41 @@
+import io
+from datetime import date
+from werkzeug.security import check_password_hash
+from models import db, User, Group, Student
+import roster
+
+ROSTER = """fullName;dateBirth;groupName;login;password
+Иванов Иван;2008-03-01;10А;ivanov;p1
+Петров Пётр;31.02.2008;10А;petrov;p2
+Сидоров Сидор;2008-05-05;11Я;sidorov;p3
+Смирнова Анна;05.06.2008;10А;smirnova;p4
+Смирнова Анна (повтор);05.06.2008;10А;smirnova;p5
+Кузнецов Олег;2008-07-07;10А;taken;p6
+Орлова Мария;2008-08-08;10А;orlova;p7
+"""
+
+
+def test_import_reports_bad_rows_and_saves_the_rest(app):
+    group = Group(number="10А")
+    db.session.add_all([group, User(role="студент", login="taken", passwordHash="-")])
+    db.session.commit()
+    stream = io.BytesIO(ROSTER.encode("utf-8-sig"))
+
+    report = roster.import_users("students", roster.read_rows(stream, "students.csv", "students"), batch_size=2)
+
+    assert report.created == 3
+    assert [(line, login) for line, login, message in report.errors] == [
+        (3, "petrov"), (4, "sidorov"), (6, "smirnova"), (7, "taken")]
+    messages = {login: message for line, login, message in report.errors}
+    assert "31.02.2008" in messages["petrov"]
+    assert "11Я" in messages["sidorov"]
+    assert "повторяется" in messages["smirnova"]
+    assert "уже зарегистрирован" in messages["taken"]
+    db.session.expire_all()
+    students = {student.fullName: student for student in Student.query}
+    assert set(students) == {"Иванов Иван", "Смирнова Анна", "Орлова Мария"}
+    assert all(student.id_group == group.id for student in students.values())
+    assert students["Смирнова Анна"].dateBirth == date(2008, 6, 5)
+    user = User.query.filter_by(login="smirnova").one()
+    assert user.role == "студент" and check_password_hash(user.passwordHash, "p4")
+    assert User.query.filter_by(login="petrov").first() is None
@@ -0,0 +1,78 @@
+import pytest
+from datetime import date
+from sqlalchemy import event
+from werkzeug.security import generate_password_hash
+from models import db, User, Group, Student, Teacher, Discipline, TeacherGroup, TeacherDiscipline, LaboratoryWork, \
+    WorkGroup, ResultLabWork
+
+
+# Ученик с одной оценкой и преподаватель его класса; пароль обоих — "p"
+@pytest.fixture
+def school(app):
+    password = generate_password_hash("p", method="pbkdf2:sha256:1000")
+    group = Group(number="10A")
+    discipline = Discipline(name="Math")
+    db.session.add_all([group, discipline])
+    db.session.flush()
+    teacher_user = User(role="преподаватель", login="teacher", passwordHash=password)
+    student_user = User(role="студент", login="student", passwordHash=password)
+    db.session.add_all([teacher_user, student_user])
+    db.session.flush()
+    teacher = Teacher(fullName="Teacher", id_user=teacher_user.id)
+    student = Student(fullName="Student", id_user=student_user.id, id_group=group.id)
+    work = LaboratoryWork(number=1, name="LW 1", id_discipline=discipline.id)
+    db.session.add_all([teacher, student, work])
+    db.session.flush()
+    db.session.add_all([TeacherGroup(id_teacher=teacher.id, id_group=group.id),
+                        TeacherDiscipline(id_teacher=teacher.id, id_discipline=discipline.id),
+                        WorkGroup(deadline=date(2100, 1, 1), id_LaboratoryWork=work.id, id_discipline=discipline.id,
+                                  id_group=group.id),
+                        ResultLabWork(status="принято", grade=4, id_LaboratoryWork=work.id,
+                                      id_discipline=discipline.id, id_student=student.id)])
+    db.session.commit()
+    return dict(id_group=group.id, id_discipline=discipline.id, id_work=work.id, id_student=student.id)
+
+
+def client(app, login):
+    client = app.test_client()
+    assert client.post("/login", data={"login": login, "password": "p"}).status_code == 302
+    return client
+
+
+def test_matching_etag_returns_not_modified(app, school):
+    student = client(app, "student")
+    response = student.get("/profile_student/snapshot")
+    assert response.status_code == 200
+    assert response.get_json()["lab_works"][0]["grade"] == 4
+    etag = response.headers["ETag"]
+    statements = []
+
+    def count(*args):
+        statements.append(args[2])
+
+    event.listen(db.engine, "before_cursor_execute", count)
+    try:
+        response = student.get("/profile_student/snapshot", headers={"If-None-Match": etag})
+    finally:
+        event.remove(db.engine, "before_cursor_execute", count)
+    assert response.status_code == 304
+    assert response.headers["ETag"] == etag
+    assert statements == []
+    response = student.get("/profile_student/snapshot", headers={"If-None-Match": '"other"'})
+    assert response.status_code == 200
+
+
+def test_etag_changes_after_grading(app, school):
+    student = client(app, "student")
+    etag = student.get("/profile_student/snapshot").headers["ETag"]
+    teacher = client(app, "teacher")
+    response = teacher.post("/result_lw/%(id_group)d/%(id_work)d/%(id_discipline)d" % school,
+                            data={"mode": "batch", "status_%d" % school["id_student"]: "не принято",
+                                  "grade_%d" % school["id_student"]: "2"})
+    assert "Запись успешно добавлена" in response.get_data(as_text=True)
+    response = student.get("/profile_student/snapshot", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+    assert response.get_json()["lab_works"][0]["grade"] == 2
+    response = student.get("/profile_student/snapshot", headers={"If-None-Match": response.headers["ETag"]})
+    assert response.status_code == 304
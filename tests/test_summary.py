@@ -0,0 +1,114 @@
+from datetime import date
+from models import db, User, Group, Student, Teacher, Discipline, TeacherGroup, TeacherDiscipline, LaboratoryWork, \
+    WorkGroup, ControlWork, ResultLabWork, ResultControlWork, StudentSummary, GroupSummary
+import repository
+import summary
+import writes
+
+PAST = date(2020, 1, 1)
+FUTURE = date(2100, 1, 1)
+
+
+# Класс из трёх учеников; преподаватель ведёт у класса одну дисциплину
+def school():
+    group = Group(number="10А")
+    discipline = Discipline(name="Физика")
+    teacher = Teacher(fullName="Учитель")
+    db.session.add_all([group, discipline, teacher])
+    db.session.flush()
+    db.session.add_all([TeacherGroup(id_teacher=teacher.id, id_group=group.id),
+                        TeacherDiscipline(id_teacher=teacher.id, id_discipline=discipline.id)])
+    students = []
+    for i in range(3):
+        user = User(role="студент", login="s%d" % i, passwordHash="-")
+        db.session.add(user)
+        db.session.flush()
+        students.append(Student(fullName="Ученик %d" % i, id_user=user.id, id_group=group.id))
+    db.session.add_all(students)
+    db.session.flush()
+    return group.id, discipline.id, [student.id for student in students]
+
+
+def lab_work(name, id_group, id_discipline, deadline):
+    work = LaboratoryWork(number=1, name=name, id_discipline=id_discipline)
+    db.session.add(work)
+    db.session.flush()
+    db.session.add(WorkGroup(deadline=deadline, id_LaboratoryWork=work.id, id_discipline=id_discipline,
+                             id_group=id_group))
+    return work.id
+
+
+def control_work(name, id_discipline, deadline):
+    work = ControlWork(number=1, name=name, deadline=deadline, id_discipline=id_discipline)
+    db.session.add(work)
+    db.session.flush()
+    return work.id
+
+
+# Запись оценок так же, как в обработчиках result_lw и result_cw
+def grade(kind, id_work, id_discipline, id_group, grades):
+    model, work_column = summary.WORKS[kind]
+    rows = [dict(id_student=id_student, status=status, grade=value, id_discipline=id_discipline,
+                 **{work_column: id_work}) for id_student, status, value in grades]
+    summary.record_results(kind, id_work, id_discipline, id_group, rows)
+    repository.save_results(model, work_column, rows)
+    db.session.commit()
+
+
+def totals():
+    return (sorted(tuple(getattr(r, c) for c in ("id_student", "id_discipline") + summary.COUNTERS)
+                   for r in StudentSummary.query),
+            sorted(tuple(getattr(r, c) for c in ("id_group", "id_discipline") + summary.GROUP_COUNTERS)
+                   for r in GroupSummary.query))
+
+
+def rebuilt():
+    summary.rebuild()
+    db.session.commit()
+    return totals()
+
+
+def test_grades_and_regrades_match_rebuild(app):
+    id_group, id_discipline, students = school()
+    lw = lab_work("ПР 1", id_group, id_discipline, FUTURE)
+    lw_overdue = lab_work("ПР 2", id_group, id_discipline, PAST)
+    cw_overdue = control_work("КР 1", id_discipline, PAST)
+    db.session.commit()
+    summary.rebuild()
+    db.session.commit()
+
+    grade("lw", lw, id_discipline, id_group, [(students[0], "принято", 5), (students[1], "не принято", 2)])
+    grade("lw", lw, id_discipline, id_group, [(students[1], "принято", 4), (students[2], "принято", 3)])
+    grade("lw", lw_overdue, id_discipline, id_group, [(students[0], "принято", 3)])
+    grade("cw", cw_overdue, id_discipline, id_group, [(students[2], "не принято", 2)])
+    grade("cw", cw_overdue, id_discipline, id_group, [(students[2], "принято", 5)])
+    lw_new = LaboratoryWork(number=3, name="ПР 3", id_discipline=id_discipline)
+    db.session.add(lw_new)
+    db.session.commit()
+    writes.run(writes.assign_lab_work, lw_new.id, id_group, PAST, Discipline.query.all())
+    writes.run(writes.add_control_work, 2, "КР 2", PAST, id_discipline)
+    writes.run(writes.add_control_work, 3, "КР 3", FUTURE, id_discipline)
+
+    incremental = totals()
+    assert any(row[5] for row in incremental[0]), incremental
+    assert incremental == rebuilt()
+
+
+# Срок работы прошёл после последнего пересчёта: она ещё не учтена как просроченная, и её сдача не должна
+# уменьшать число других просроченных работ
+def test_work_overdue_since_rebuild(app):
+    id_group, id_discipline, students = school()
+    lw = lab_work("ПР 1", id_group, id_discipline, date(2020, 2, 1))
+    lab_work("ПР 2", id_group, id_discipline, PAST)
+    cw = control_work("КР 1", id_discipline, date(2020, 2, 1))
+    control_work("КР 2", id_discipline, PAST)
+    db.session.commit()
+    summary.rebuild(today=date(2020, 1, 15))
+    db.session.commit()
+
+    grade("lw", lw, id_discipline, id_group, [(id_student, "принято", 4) for id_student in students])
+    grade("cw", cw, id_discipline, id_group, [(id_student, "принято", 4) for id_student in students])
+
+    incremental = totals()
+    assert [(row[5], row[9]) for row in incremental[0]] == [(1, 1)] * len(students)
+    assert incremental == rebuilt()
@@ -0,0 +1,547 @@
+import json
+from flask import Blueprint, Response, abort, render_template, request, redirect, flash, jsonify, send_file
+from flask_login import LoginManager, login_required, login_user, logout_user, current_user
+from models import db, User, Group, Student, Teacher, Administrator, TeacherGroup, Discipline, TeacherDiscipline, \
+    ResultLabWork, ResultControlWork, ReportJob
+import repository
+import roster
+import summary
+from hashing import hasher, HasherBusy
+from identity import identity_cache
+from cache import reference_cache
+from pagination import paginate, search_pattern
+from fragments import Lazy
+from snapshots import snapshot_cache
+import snapshots
+from audit import audit_log
+from profiling import profiler
+import audit
+from reports import report_worker
+import reports
+import writes
+
+# Страницы приложения. Подключаются к приложению в create_app (app.py)
+views = Blueprint("views", __name__)
+login_manager = LoginManager()
+
+
+@login_manager.user_loader
+def load_user(user_id):
+    try:
+        return identity_cache.get(int(user_id))
+    except ValueError:
+        return None
+
+
+# Справочники для выпадающих списков: читаются из кеша, который сбрасывается при записи в соответствующие таблицы
+def cached_groups():
+    return reference_cache.get("groups", ("Group",), repository.all_groups)
+
+
+def cached_disciplines():
+    return reference_cache.get("disciplines", ("Discipline",), repository.all_disciplines)
+
+
+def cached_teachers():
+    return reference_cache.get("teachers", ("Teacher",), repository.all_teachers)
+
+
+def cached_teacher_groups(id_teacher):
+    return reference_cache.get(("teacher_groups", id_teacher), ("Group", "TeacherGroup"),
+                               lambda: repository.teacher_groups(id_teacher))
+
+
+def cached_teacher_disciplines(id_teacher):
+    return reference_cache.get(("teacher_disciplines", id_teacher), ("Discipline", "TeacherDiscipline"),
+                               lambda: repository.teacher_disciplines(id_teacher))
+
+
+# Главная страница входа
+@views.route("/", methods=("POST", "GET"))
+@views.route("/login", methods=("POST", "GET"))
+def login():
+    if request.method == "POST":
+        login = request.form["login"]
+        password = request.form["password"]
+        user = User.query.filter_by(login=login).first()
+        try:
+            valid = user and hasher.verify(user.passwordHash, password)
+        except HasherBusy:
+            flash("Сервер перегружен, повторите вход через несколько секунд")
+            return render_template("login.html"), 503
+        if valid and hasher.needs_rehash(user.passwordHash):
+            # Пароль верный: если пул хеширования занят, хеш пересчитается при следующем входе
+            try:
+                user.passwordHash = hasher.hash(password)
+                db.session.commit()
+            except HasherBusy:
+                pass
+        if valid:
+            identity_cache.invalidate(user.id)
+            login_user(identity_cache.get(user.id))
+            if user.role == "студент":
+                return redirect("/profile_student")
+            elif user.role == "преподаватель":
+                return redirect("/profile_teacher")
+            else:
+                return redirect("/profile_admin")
+        else:
+            flash("Неверный логин или пароль")
+    return render_template("login.html")
+
+
+# Обработчик выхода
+@views.route("/logout", methods=("GET", "POST"))
+@login_required
+def logout():
+    identity_cache.invalidate(current_user.id)
+    logout_user()
+    return redirect("/login")
+
+
+# Страница регистрации студента
+@views.route("/reg_student", methods=("POST", "GET"))
+@login_required
+def reg_student():
+    if request.method == "POST":
+        try:
+            id_group = writes.choice(request.form, "id_group", cached_groups())
+            date_birth = writes.form_date(request.form, "dateBirth")
+            hash = hasher.hash(request.form["password"])
+            id_user = writes.run(writes.register_student, request.form["login"], hash, request.form["fullName"],
+                                 date_birth, id_group)
+            identity_cache.invalidate(id_user)
+            flash("Студент успешно добавлен", category="success")
+        except writes.WriteError as error:
+            flash(str(error), category="error")
+        except:
+            flash(
+                "Возникла ошибка при добавлении записи в базу данных. Проверьте корректность введённых данных. Возможно, студент с таким логином уже зарегистрирован",
+                category="error")
+    stud_list = paginate(repository.student_listing(search_pattern()), repository.STUDENT_SORTS, "fullName", Student.id)
+    group_list = cached_groups()
+    return render_template("reg_student.html", stud_list=stud_list, group_list=group_list)
+
+
+# Страница регистрации преподавателя
+@views.route("/reg_teacher", methods=("POST", "GET"))
+@login_required
+def reg_teacher():
+    if request.method == "POST":
+        try:
+            date_birth = writes.form_date(request.form, "dateBirth")
+            hash = hasher.hash(request.form["password"])
+            id_user = writes.run(writes.register_teacher, request.form["login"], hash, request.form["fullName"],
+                                 date_birth, request.form["qualification"])
+            reference_cache.bump("Teacher")
+            identity_cache.invalidate(id_user)
+            flash("Преподаватель успешно добавлен", category="success")
+        except writes.WriteError as error:
+            flash(str(error), category="error")
+        except:
+            flash(
+                "Возникла ошибка при добавлении записи в базу данных. Проверьте корректность введённых данных. Возможно, преподаватель с таким логином уже зарегистрирован",
+                category="error")
+    teacher_list = paginate(repository.teacher_listing(search_pattern()), repository.TEACHER_SORTS, "fullName",
+                            Teacher.id)
+    return render_template("reg_teacher.html", teacher_list=teacher_list)
+
+
+# Загрузка списка учеников или преподавателей из файла CSV/XLSX
+@views.route("/import_users", methods=("POST", "GET"))
+@login_required
+def import_users():
+    report = None
+    if request.method == "POST":
+        file = request.files.get("file")
+        kind = request.form["kind"]
+        try:
+            report = roster.import_users(kind, roster.read_rows(file.stream, file.filename, kind))
+            flash("Загрузка завершена: добавлено записей %d, строк с ошибками %d" % (report.created, len(report.errors)),
+                  category="success")
+        except roster.RowError as error:
+            db.session.rollback()
+            flash(str(error), category="error")
+        except:
+            db.session.rollback()
+            flash("Возникла ошибка при чтении файла. Проверьте формат файла", category="error")
+    return render_template("import_users.html", report=report)
+
+
+# Добавление учебного класса
+@views.route("/add_group", methods=("POST", "GET"))
+@login_required
+def add_group():
+    if request.method == "POST":
+        try:
+            writes.run(writes.add_group, request.form["number"])
+            reference_cache.bump("Group")
+            flash("Класс успешно добавлен", category="success")
+        except:
+            flash(
+                "Возникла ошибка при добавлении записи в базу данных. Проверьте корректность введённых данных. Возможно, такой класс уже создан",
+                category="error")
+    group_list = paginate(repository.group_listing(search_pattern()), repository.GROUP_SORTS, "number", Group.id)
+    return render_template("add_group.html", group_list=group_list)
+
+
+# Добавление дисциплины
+@views.route("/add_discipline", methods=("POST", "GET"))
+@login_required
+def add_discipline():
+    if request.method == "POST":
+        try:
+            writes.run(writes.add_discipline, request.form["name"])
+            reference_cache.bump("Discipline")
+            flash("Дисциплина успешно добавлена", category="success")
+        except:
+            flash(
+                "Возникла ошибка при добавлении записи в базу данных. Проверьте корректность введённых данных. Возможно, дисциплина с таким названием уже существует",
+                category="error")
+    discipl_list = paginate(repository.discipline_listing(search_pattern()), repository.DISCIPLINE_SORTS, "name",
+                            Discipline.id)
+    return render_template("add_discipline.html", discipl_list=discipl_list)
+
+
+# Преподаватель и дисциплина
+@views.route("/teacher_discipline", methods=("POST", "GET"))
+@login_required
+def teacher_discipline():
+    if request.method == "POST":
+        try:
+            id_teacher = writes.choice(request.form, "id_teacher", cached_teachers())
+            id_discipline = writes.choice(request.form, "id_discipline", cached_disciplines())
+            writes.run(writes.add_teacher_discipline, id_teacher, id_discipline)
+            reference_cache.bump("TeacherDiscipline")
+            flash("Запись успешно добавлена", category="success")
+        except writes.WriteError as error:
+            flash(str(error), category="error")
+        except:
+            flash("Возникла ошибка при добавлении записи в базу данных. Проверьте корректность введённых данных",
+                  category="error")
+    list = paginate(repository.teacher_discipline_listing(search_pattern()), repository.TEACHER_DISCIPLINE_SORTS,
+                    "teacher", TeacherDiscipline.id)
+    teach_list = cached_teachers()
+    d_list = cached_disciplines()
+    return render_template("teacher_discipline.html", list=list, teach_list=teach_list, d_list=d_list)
+
+
+# Преподаватель и группа
+@views.route("/teacher_group", methods=("POST", "GET"))
+@login_required
+def teacher_group():
+    if request.method == "POST":
+        try:
+            id_teacher = writes.choice(request.form, "id_teacher", cached_teachers())
+            id_group = writes.choice(request.form, "id_group", cached_groups())
+            writes.run(writes.add_teacher_group, id_teacher, id_group)
+            reference_cache.bump("TeacherGroup")
+            flash("Запись успешно добавлена", category="success")
+        except writes.WriteError as error:
+            flash(str(error), category="error")
+        except:
+            flash("Возникла ошибка при добавлении записи в базу данных. Проверьте корректность введённых данных",
+                  category="error")
+    list = paginate(repository.teacher_group_listing(search_pattern()), repository.TEACHER_GROUP_SORTS, "teacher",
+                    TeacherGroup.id)
+    teach_list = cached_teachers()
+    group_list = cached_groups()
+    return render_template("teacher_group.html", list=list, teach_list=teach_list, group_list=group_list)
+
+
+# Страница профиля студента
+@views.route("/profile_student", methods=("POST", "GET"))
+@login_required
+def profile_student():
+    stud = None
+    result_lw_list = []
+    result_cw_list = []
+    summaries = []
+    notifications = []
+    snapshot = snapshot_cache.load(current_user.id_student) if current_user.id_student else None
+    if snapshot is not None:
+        data = json.loads(snapshot[2])
+        stud = data["student"]
+        result_lw_list = data["lab_works"]
+        result_cw_list = data["control_works"]
+        summaries = repository.student_summaries(stud["id"], stud["id_group"])
+        notifications = repository.student_notifications(stud["id"])
+    return render_template("profile_student.html", stud=stud, result_lw_list=result_lw_list,
+                           result_cw_list=result_cw_list, summaries=summaries, notifications=notifications)
+
+
+def snapshot_response(id_student, version, modified, data=""):
+    response = Response(data, mimetype="application/json")
+    if version is not None:
+        response.set_etag("%d-%d" % (id_student, version))
+        response.last_modified = modified
+    response.headers["Cache-Control"] = "private, no-cache"
+    return response
+
+
+# Оценки ученика в формате JSON с ETag и Last-Modified. Если версия данных известна процессу и совпадает с
+# If-None-Match, ответ 304 отдаётся без обращения к БД; иначе данные читаются из одной строки StudentSnapshot
+@views.route("/profile_student/snapshot")
+@login_required
+def student_snapshot():
+    id_student = current_user.id_student
+    if not id_student:
+        abort(404)
+    known = snapshot_cache.version(id_student)
+    if known is not None:
+        response = snapshot_response(id_student, *known).make_conditional(request)
+        if response.status_code == 304:
+            return response
+    snapshot = snapshot_cache.load(id_student)
+    if snapshot is None:
+        abort(404)
+    return snapshot_response(id_student, *snapshot).make_conditional(request)
+
+
+# Страница профиля преподавателя
+@views.route("/profile_teacher", methods=("POST", "GET"))
+@login_required
+def profile_teacher():
+    inf = None
+    groups = []
+    discipline = []
+    if current_user.id_teacher:
+        inf = Teacher.query.get(current_user.id_teacher)
+        groups = Lazy(cached_teacher_groups, inf.id)
+        discipline = Lazy(cached_teacher_disciplines, inf.id)
+    return render_template("profile_teacher.html", inf=inf, groups=groups, discipline=discipline,
+                           id_teacher=current_user.id_teacher)
+
+
+# Страница группы
+@views.route("/group/<string:number>/<int:id_group>", methods=("POST", "GET"))
+@login_required
+def group(number, id_group):
+    if request.method == "POST":
+        try:
+            id_work = int(request.form["id_LaboratoryWork"])
+            writes.run(writes.assign_lab_work, id_work, id_group, writes.form_date(request.form, "deadline"),
+                       cached_teacher_disciplines(current_user.id_teacher))
+            reference_cache.bump("WorkGroup")
+            flash("Запись успешно добавлена", category="success")
+        except writes.WriteError as error:
+            flash(str(error), category="error")
+        except:
+            flash("Возникла ошибка при добавлении записи в базу данных. Проверьте корректность введённых данных",
+                  category="error")
+
+    id_teacher = current_user.id_teacher
+    lr_list = Lazy(repository.group_lab_works, id_teacher, id_group)
+    cr_list = Lazy(repository.teacher_control_works, id_teacher)
+    lw_list = Lazy(repository.teacher_lab_works, id_teacher)
+    summaries = repository.group_summaries(id_teacher, id_group)
+    return render_template("group.html", number=number, id_group=id_group, lr_list=lr_list, cr_list=cr_list,
+                           lw_list=lw_list, summaries=summaries, id_teacher=id_teacher)
+
+
+# Добавление ЛР
+@views.route("/add_lw", methods=("POST", "GET"))
+@login_required
+def add_lw():
+    if request.method == "POST":
+        try:
+            id_discipline = writes.choice(request.form, "id_discipline",
+                                          cached_teacher_disciplines(current_user.id_teacher))
+            writes.run(writes.add_lab_work, request.form["number"], request.form["name"], id_discipline)
+            reference_cache.bump("LaboratoryWork")
+            flash("Запись успешно добавлена", category="success")
+        except writes.WriteError as error:
+            flash(str(error), category="error")
+        except:
+            flash("Возникла ошибка при добавлении записи в базу данных. Проверьте корректность введённых данных",
+                  category="error")
+    id_teacher = current_user.id_teacher
+    lw_list = Lazy(repository.teacher_lab_works, id_teacher)
+    d_list = cached_teacher_disciplines(id_teacher)
+    return render_template("add_lw.html", lw_list=lw_list, d_list=d_list, id_teacher=id_teacher)
+
+
+# Добавление КР
+@views.route("/add_cw", methods=("POST", "GET"))
+@login_required
+def add_cw():
+    if request.method == "POST":
+        try:
+            id_discipline = writes.choice(request.form, "id_discipline",
+                                          cached_teacher_disciplines(current_user.id_teacher))
+            writes.run(writes.add_control_work, request.form["number"], request.form["name"],
+                       writes.form_date(request.form, "deadline"), id_discipline)
+            reference_cache.bump("ControlWork")
+            flash("Запись успешно добавлена", category="success")
+        except writes.WriteError as error:
+            flash(str(error), category="error")
+        except:
+            flash("Возникла ошибка при добавлении записи в базу данных. Проверьте корректность введённых данных",
+                  category="error")
+    id_teacher = current_user.id_teacher
+    cw_list = Lazy(repository.teacher_control_works, id_teacher)
+    d_list = cached_teacher_disciplines(id_teacher)
+    return render_template("add_cw.html", cw_list=cw_list, d_list=d_list, id_teacher=id_teacher)
+
+
+# Оценка ученика из формы: пустая или нечисловая оценка — ошибка с ФИО ученика
+def parse_grade(grade, student):
+    grade = grade.strip()
+    if not grade:
+        raise ValueError("Не указана оценка для %s" % student.fullName)
+    try:
+        return int(grade)
+    except ValueError:
+        raise ValueError("Оценка для %s должна быть числом" % student.fullName)
+
+
+# Оценки всего класса из таблицы формы: поля status_<id ученика> и grade_<id ученика>
+def grade_rows(form, students):
+    rows = []
+    for student in students:
+        status = form.get("status_%d" % student.id, "")
+        grade = form.get("grade_%d" % student.id, "").strip()
+        if not status and not grade:
+            continue
+        if not status:
+            raise ValueError("Не указан статус для %s" % student.fullName)
+        rows.append(dict(status=status, grade=parse_grade(grade, student), id_student=student.id))
+    if not rows:
+        raise ValueError("Нет оценок для сохранения")
+    return rows
+
+
+# Оценка одного ученика из формы добавления. Ученик передаётся по id: у одноклассников может совпадать ФИО
+def single_row(form, students):
+    students = {student.id: student for student in students}
+    try:
+        student = students[int(form.get("id_student", ""))]
+    except (ValueError, KeyError):
+        raise ValueError("Ученик не выбран или не из этого класса")
+    if not form.get("status"):
+        raise ValueError("Не указан статус для %s" % student.fullName)
+    return [dict(status=form["status"], grade=parse_grade(form.get("grade", ""), student), id_student=student.id)]
+
+
+# Добавление оценки за КР
+@views.route("/result_cw/<int:id_group>/<int:id_controlWork>/<int:id_discipline>", methods=("POST", "GET"))
+@login_required
+def result_cw(id_group, id_controlWork, id_discipline):
+    id_group = id_group
+    id = id_controlWork
+    stud_in_group = repository.group_students(id_group)
+    if request.method == "POST":
+        try:
+            if request.form.get("mode") == "batch":
+                rows = grade_rows(request.form, stud_in_group)
+            else:
+                rows = single_row(request.form, stud_in_group)
+            for row in rows:
+                row.update(id_discipline=id_discipline, id_controlWork=id)
+            previous = summary.record_results("cw", id, id_discipline, id_group, rows)
+            repository.save_results(ResultControlWork, "id_controlWork", rows)
+            audit_log.record(audit.grade_changes("cw", id, id_discipline, rows, previous, current_user.id))
+            snapshots.invalidate([row["id_student"] for row in rows])
+            db.session.commit()
+            snapshot_cache.bump([row["id_student"] for row in rows])
+            flash("Запись успешно добавлена", category="success")
+        except ValueError as e:
+            db.session.rollback()
+            flash(str(e), category="error")
+        except:
+            db.session.rollback()
+            flash("Возникла ошибка при добавлении записи в базу данных. Проверьте корректность введённых данных",
+                  category="error")
+    id_teacher = current_user.id_teacher
+    result_cw_list = paginate(repository.group_cw_results(id_teacher, id_group, id_controlWork),
+                              repository.RESULT_CW_SORTS, "fullName", ResultControlWork.id)
+    grades = {r.id_student: r for r in repository.group_grades(ResultControlWork, "id_controlWork", id_group, id)}
+    return render_template("result_cw.html", result_cw_list=result_cw_list, stud_in_group=stud_in_group, grades=grades,
+                           id_group=id_group, id_controlWork=id_controlWork)
+
+
+# Добавление оценки за ЛР
+@views.route("/result_lw/<int:id_group>/<int:id_LaboratoryWork>/<int:id_discipline>", methods=("POST", "GET"))
+@login_required
+def result_lw(id_group, id_LaboratoryWork, id_discipline):
+    id_group = id_group
+    id = id_LaboratoryWork
+    stud_in_group = repository.group_students(id_group)
+    if request.method == "POST":
+        try:
+            if request.form.get("mode") == "batch":
+                rows = grade_rows(request.form, stud_in_group)
+            else:
+                rows = single_row(request.form, stud_in_group)
+            for row in rows:
+                row.update(id_discipline=id_discipline, id_LaboratoryWork=id)
+            previous = summary.record_results("lw", id, id_discipline, id_group, rows)
+            repository.save_results(ResultLabWork, "id_LaboratoryWork", rows)
+            audit_log.record(audit.grade_changes("lw", id, id_discipline, rows, previous, current_user.id))
+            snapshots.invalidate([row["id_student"] for row in rows])
+            db.session.commit()
+            snapshot_cache.bump([row["id_student"] for row in rows])
+            flash("Запись успешно добавлена", category="success")
+        except ValueError as e:
+            db.session.rollback()
+            flash(str(e), category="error")
+        except:
+            db.session.rollback()
+            flash("Возникла ошибка при добавлении записи в базу данных. Проверьте корректность введённых данных",
+                  category="error")
+    id_teacher = current_user.id_teacher
+    result_lw_list = paginate(repository.group_lw_results(id_teacher, id_group, id_LaboratoryWork),
+                              repository.RESULT_LW_SORTS, "fullName", ResultLabWork.id)
+    grades = {r.id_student: r for r in repository.group_grades(ResultLabWork, "id_LaboratoryWork", id_group, id)}
+    return render_template("result_lw.html", result_lw_list=result_lw_list, stud_in_group=stud_in_group, grades=grades,
+                           id_group=id_group, id_LaboratoryWork=id_LaboratoryWork)
+
+
+# Страница профиля админа
+@views.route("/profile_admin", methods=("POST", "GET"))
+@login_required
+def profile_admin():
+    inf = Administrator.query.get(current_user.id_administrator) if current_user.id_administrator else None
+    jobs = reports.recent_jobs() if current_user.role == "администратор" else []
+    return render_template("profile_admin.html", inf=inf, jobs=jobs, status_names=reports.STATUS_NAMES,
+                           group_list=cached_groups(), discipline_list=cached_disciplines())
+
+
+# Постановка отчёта по классам и дисциплинам в очередь; строит его команда flask report-worker
+@views.route("/reports", methods=("POST",))
+@login_required
+def create_report():
+    if current_user.role != "администратор":
+        abort(403)
+    try:
+        id_group = writes.choice(request.form, "id_group", cached_groups()) if request.form.get("id_group") else None
+        id_discipline = writes.choice(request.form, "id_discipline", cached_disciplines()) \
+            if request.form.get("id_discipline") else None
+        writes.run(reports.enqueue, current_user.id, id_group, id_discipline)
+        flash("Отчёт поставлен в очередь", category="success")
+    except writes.WriteError as error:
+        flash(str(error), category="error")
+    except:
+        flash("Возникла ошибка при добавлении записи в базу данных", category="error")
+    return redirect("/profile_admin")
+
+
+# Файл готового отчёта (только для администратора)
+@views.route("/reports/<int:id_job>")
+@login_required
+def download_report(id_job):
+    if current_user.role != "администратор":
+        abort(403)
+    job = ReportJob.query.get(id_job)
+    path = report_worker.path(job) if job is not None else None
+    if path is None:
+        abort(404)
+    return send_file(path, mimetype="text/csv", as_attachment=True, download_name=job.fileName)
+
+
+# Показатели хеширования паролей: время и занятость очереди. Доступ как к /metrics: администратору или по токену
+@views.route("/metrics/hashing")
+def hashing_metrics():
+    if not profiler.allowed():
+        return Response("unauthorized\n", status=401, mimetype="text/plain")
+    return jsonify(hasher.stats())
@@ -0,0 +1,115 @@
+import time
+from datetime import date
+from sqlalchemy.exc import DBAPIError
+from models import db, User, Group, Student, Teacher, TeacherGroup, Discipline, TeacherDiscipline, LaboratoryWork, \
+    WorkGroup, ControlWork
+import summary
+
+# Запись данных из форм. Внешние ключи приходят из формы в виде id (значения выпадающих списков), id новых записей
+# берутся из INSERT (RETURNING на PostgreSQL) при flush, поэтому все изменения формы выполняются одной транзакцией
+# без повторного чтения только что добавленных строк
+
+ATTEMPTS = 3
+# Конфликт сериализации и взаимная блокировка: транзакцию можно повторить целиком
+RETRY_CODES = {"40001", "40P01"}
+
+
+# Ошибка в данных формы; текст показывается пользователю
+class WriteError(Exception):
+    pass
+
+
+# id из поля формы, который должен быть среди id списка options (строки справочника из кеша)
+def choice(form, name, options):
+    try:
+        value = int(form[name])
+    except (KeyError, ValueError):
+        raise WriteError("Выберите значение из списка")
+    if value not in {option.id for option in options}:
+        raise WriteError("Выбранной записи нет в списке")
+    return value
+
+
+# Дата из поля <input type="date"> (ГГГГ-ММ-ДД)
+def form_date(form, name):
+    try:
+        return date.fromisoformat(form[name])
+    except (KeyError, ValueError):
+        raise WriteError("Неверная дата")
+
+
+def retryable(error):
+    code = getattr(error.orig, "pgcode", None) or getattr(error.orig, "sqlstate", None)
+    return code in RETRY_CODES
+
+
+# Выполнение work(*args) и фиксация транзакции. При конфликте сериализации или взаимной блокировке транзакция
+# откатывается и повторяется (до ATTEMPTS раз), при любой другой ошибке откатывается и ошибка передаётся дальше
+def run(work, *args, attempts=ATTEMPTS):
+    for attempt in range(1, attempts + 1):
+        try:
+            result = work(*args)
+            db.session.commit()
+            return result
+        except DBAPIError as error:
+            db.session.rollback()
+            if attempt == attempts or not retryable(error):
+                raise
+            time.sleep(0.05 * attempt)
+        except:
+            db.session.rollback()
+            raise
+
+
+def add_user(role, login, password_hash):
+    user = User(role=role, login=login, passwordHash=password_hash)
+    db.session.add(user)
+    db.session.flush()
+    return user.id
+
+
+def register_student(login, password_hash, full_name, date_birth, id_group):
+    id_user = add_user("студент", login, password_hash)
+    db.session.add(Student(fullName=full_name, dateBirth=date_birth, id_group=id_group, id_user=id_user))
+    return id_user
+
+
+def register_teacher(login, password_hash, full_name, date_birth, qualification):
+    id_user = add_user("преподаватель", login, password_hash)
+    db.session.add(Teacher(fullName=full_name, dateBirth=date_birth, qualification=qualification, id_user=id_user))
+    return id_user
+
+
+def add_group(number):
+    db.session.add(Group(number=number))
+
+
+def add_discipline(name):
+    db.session.add(Discipline(name=name))
+
+
+def add_teacher_discipline(id_teacher, id_discipline):
+    db.session.add(TeacherDiscipline(id_teacher=id_teacher, id_discipline=id_discipline))
+
+
+def add_teacher_group(id_teacher, id_group):
+    db.session.add(TeacherGroup(id_teacher=id_teacher, id_group=id_group))
+
+
+def add_lab_work(number, name, id_discipline):
+    db.session.add(LaboratoryWork(number=number, name=name, id_discipline=id_discipline))
+
+
+def add_control_work(number, name, deadline, id_discipline):
+    db.session.add(ControlWork(number=number, name=name, deadline=deadline, id_discipline=id_discipline))
+    summary.record_control_work(id_discipline, deadline)
+
+
+# Назначение проверочной работы классу; работа должна относиться к одной из дисциплин преподавателя
+def assign_lab_work(id_work, id_group, deadline, disciplines):
+    id_discipline = db.session.query(LaboratoryWork.id_discipline).filter(LaboratoryWork.id == id_work).scalar()
+    if id_discipline not in {discipline.id for discipline in disciplines}:
+        raise WriteError("Выбранной работы нет в списке")
+    db.session.add(WorkGroup(deadline=deadline, id_LaboratoryWork=id_work, id_discipline=id_discipline,
+                             id_group=id_group))
+    summary.record_assignment(id_group, id_discipline, deadline)
@@ -0,0 +1,5 @@
+from app import create_app
+
+# Точка входа для WSGI-сервера: gunicorn --preload wsgi:app
+# С --preload приложение создаётся (и шаблоны компилируются) один раз до запуска рабочих процессов
+app = create_app()